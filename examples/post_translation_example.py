@@ -21,6 +21,7 @@ from pathlib import Path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import post-translation module
+from tibetan_translator import serialization
 from tibetan_translator.processors.post_translation import (
     post_process_corpus,
     analyze_term_frequencies,
@@ -40,23 +41,24 @@ def load_corpus(file_path: str) -> List[Dict[str, Any]]:
         is_jsonl = file_path.endswith('.jsonl')
         
         if is_jsonl:
-            # Load JSONL file line by line
-            with open(file_path, 'r', encoding='utf-8') as f:
+            # Load JSONL file line by line; lines are parsed as raw UTF-8
+            # bytes, so there is no separate text decode pass
+            with open(file_path, 'rb') as f:
                 for i, line in enumerate(f, 1):
                     line = line.strip()
                     if not line:  # Skip empty lines
                         continue
                     try:
                         # Parse each line as a separate JSON object
-                        doc = json.loads(line)
+                        doc = serialization.loads(line)
                         corpus.append(doc)
                     except json.JSONDecodeError as e:
                         logger.error(f"❌ Invalid JSON on line {i}: {str(e)}")
-                        logger.error(f"Line content (first 100 chars): {line[:100]}...")
+                        logger.error(f"Line content (first 100 bytes): {line[:100].decode('utf-8', 'replace')}...")
         else:
             # Load regular JSON file
-            with open(file_path, 'r', encoding='utf-8') as f:
-                corpus = json.load(f)
+            with open(file_path, 'rb') as f:
+                corpus = serialization.loads(f.read())
         
         logger.info(f"✅ Loaded corpus with {len(corpus)} documents from {file_path}")
         return corpus
@@ -24,7 +24,6 @@ from tibetan_translator.utils import (
     get_plain_translation_prompt,
     get_combined_commentary_prompt, 
     get_zero_shot_commentary_prompt,
-    translation_extraction_examples,
 )
 from tibetan_translator.config import MAX_TOKENS
 from tibetan_translator.models import Translation_extractor
@@ -0,0 +1,88 @@
+import functools
+import logging
+
+import anthropic
+
+from tibetan_translator import completion_cache
+from tibetan_translator.config import LLM_MODEL_NAME, MAX_TOKENS
+
+logger = logging.getLogger("tibetan_translator.anthropic_client")
+
+
+# Direct access to the Anthropic Messages API for call sites that need native
+# content blocks (cache_control, batches) without LangChain in between.
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """Return the process-wide synchronous Anthropic client."""
+    return anthropic.Anthropic()
+
+
+def text_block(text, cache=False):
+    """Build a text content block, optionally marked as a prompt-cache breakpoint."""
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def build_params(system_blocks, user_blocks, *, model=LLM_MODEL_NAME, max_tokens=MAX_TOKENS, thinking=None):
+    """Build Messages API params for a single-turn request."""
+    params = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": user_blocks}],
+    }
+    if system_blocks:
+        params["system"] = system_blocks
+    if thinking:
+        params["thinking"] = thinking
+    return params
+
+
+def response_text(message):
+    """Join the text blocks of an API response, skipping any thinking blocks."""
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+def _log_usage(message, label):
+    usage = message.usage
+    logger.debug(
+        "%s usage: input=%s cache_write=%s cache_read=%s",
+        label,
+        usage.input_tokens,
+        getattr(usage, "cache_creation_input_tokens", 0),
+        getattr(usage, "cache_read_input_tokens", 0),
+    )
+
+
+def invoke(system_blocks, user_blocks, *, model=LLM_MODEL_NAME, max_tokens=MAX_TOKENS, thinking=None, cache_namespace=None):
+    """Send a single-turn request and return the answer text.
+
+    Args:
+        system_blocks (list): System prompt content blocks.
+        user_blocks (list): User turn content blocks.
+        model (str): Model name.
+        max_tokens (int): Output token limit, including any thinking budget.
+        thinking (dict): Extended thinking configuration, if any.
+        cache_namespace (str): If set, the answer is stored in and served from
+            the completion cache under this versioned namespace.
+
+    Returns:
+        str: The answer text.
+    """
+    params = build_params(system_blocks, user_blocks, model=model, max_tokens=max_tokens, thinking=thinking)
+    use_cache = cache_namespace is not None and completion_cache.is_enabled()
+    if use_cache:
+        key = completion_cache.make_params_key(cache_namespace, params)
+        cached = completion_cache.lookup(key)
+        if cached is not None:
+            return cached
+
+    message = get_client().messages.create(**params)
+    _log_usage(message, cache_namespace or model)
+    text = response_text(message)
+
+    if use_cache:
+        completion_cache.store(key, text)
+    return text
@@ -1,7 +1,83 @@
 import argparse
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import anthropic
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 from tqdm.notebook import tqdm
+from tibetan_translator import completion_cache
 from tibetan_translator.workflow import optimizer_workflow
-from tibetan_translator.utils import convert_state_to_jsonl, get_json_data
+from tibetan_translator.processors.glossary import close_glossary_writers
+from tibetan_translator.utils import close_jsonl_writers, convert_state_to_jsonl, dedupe_examples, iter_json_data, preload_examples, submit_source_analyses, collect_source_analyses
+
+
+def _build_examples(data, preprocess=False):
+    """Turn raw input records into workflow input dictionaries if preprocess is set."""
+    if not preprocess:
+        return data
+    examples = []
+    for i in tqdm(data, desc="Creating input dictionaries"):
+        examples.append({
+            "source": i["root"],
+            "sanskrit": i["sanskrit"],
+            "commentary1": i.get("commentary_1", ""),
+            "commentary2": i.get("commentary_2", ""),
+            "commentary3": i.get("commentary_3", ""),
+            "feedback_history": [],
+            "format_feedback_history": [],
+            "itteration": 0,
+            "format_iteration": 0,
+            "formated": False,
+            "glossary": [],
+            "language": "English"
+        })
+    return examples
+
+
+def _dedupe(examples):
+    """Collapse duplicate verses; returns (unique_examples, index_map, copies per unique example)."""
+    unique_examples, index_map = dedupe_examples(examples)
+    copies = [0] * len(unique_examples)
+    for position in index_map:
+        copies[position] += 1
+    if len(unique_examples) < len(examples):
+        print(f"Translating {len(unique_examples)} unique verses out of {len(examples)}")
+    return unique_examples, index_map, copies
+
+
+def _has_commentary(example):
+    return any(example.get(field) not in (None, "", "None") for field in ("commentary1", "commentary2", "commentary3"))
+
+
+def submit_batch_prefill(examples):
+    """Submit source analysis for commentary-less examples as one Message Batches job.
+
+    Returns at once with a handle for collect_batch_prefill, so the batch runs
+    while earlier examples are being translated.
+    """
+    verses = [
+        (example["source"], example.get("sanskrit", ""), example.get("language", "English"))
+        for example in examples
+        if not _has_commentary(example)
+    ]
+    if not verses:
+        return None
+    return len(verses), submit_source_analyses(verses)
+
+
+def collect_batch_prefill(submitted):
+    """Wait for a batch from submit_batch_prefill and cache its analyses.
+
+    The analyses land in the completion cache, where the workflow's aggregator
+    picks them up instead of making one synchronous thinking call per verse.
+    """
+    if submitted is None:
+        return
+    verse_count, batch = submitted
+    added = collect_source_analyses(batch)
+    print(f"Batch API: cached {added} source analyses for {verse_count} verses without commentary")
 
 
 def run(data, batch_size=4, run_name="run1", preprocess=False):
@@ -9,51 +85,187 @@ def run(data, batch_size=4, run_name="run1", preprocess=False):
 
     Args:
         data (list): The list of dictionaries containing the data.
-        batch_size (int): The batch size to process.
+        batch_size (int): Maximum number of examples processed concurrently.
         run_name (str): The name of the run to save the output files.
         preprocess (bool): Whether to preprocess the data before running the workflow.
     """
-    examples = []
-    if preprocess:
-        for i in tqdm(data, desc="Creating input dictionaries"):
-            examples.append({
-                "source": i["root"],
-                "sanskrit": i["sanskrit"],
-                "commentary1": i.get("commentary_1", ""),
-                "commentary2": i.get("commentary_2", ""),
-                "commentary3": i.get("commentary_3", ""),
-                "feedback_history": [],
-                "format_feedback_history": [],
-                "itteration": 0,
-                "format_iteration": 0,
-                "formated": False,
-                "glossary": [],
-                "language": "English"
-            })
-    else:
-        examples = data
+    examples = _build_examples(data, preprocess)
 
-    batches = [examples[i:i + batch_size] for i in range(0, len(examples), batch_size)]
-    results = []
+    # Identical verses (e.g. formulaic openings and dedications) are translated once
+    unique_examples, index_map, copies = _dedupe(examples)
 
-    for batch in tqdm(batches, desc="Processing batches"):
-        try:
-            batch_results = optimizer_workflow.batch(batch)
-            for result in batch_results:
-                convert_state_to_jsonl(result, f"{run_name}.jsonl")
-            results.extend(batch_results)
-        except Exception as e:
-            print(f"Error processing batch: {e}")
-            for failed in batch:
-                convert_state_to_jsonl(failed, f"{run_name}_fail.jsonl")
+    # Submit everything at once and let LangGraph keep batch_size examples in
+    # flight; results are written as soon as each example finishes.
+    config = {"max_concurrency": batch_size, "recursion_limit": 50}
+    unique_results = {}
+
+    # A single writer thread keeps file writes in order and off the dispatch loop
+    writer_pool = ThreadPoolExecutor(max_workers=1)
+
+    writes = []
+    completed = optimizer_workflow.batch_as_completed(unique_examples, config=config, return_exceptions=True)
+    for position, result in tqdm(completed, total=len(unique_examples), desc="Processing examples"):
+        if isinstance(result, Exception):
+            print(f"Error processing example {position}: {result}")
+            for _ in range(copies[position]):
+                writes.append((position, None, writer_pool.submit(convert_state_to_jsonl, unique_examples[position], f"{run_name}_fail.jsonl")))
+            continue
+        for _ in range(copies[position]):
+            writes.append((position, result, writer_pool.submit(convert_state_to_jsonl, result, f"{run_name}.jsonl")))
+        unique_results[position] = result
+
+    writer_pool.shutdown(wait=True)
+
+    # Surface write errors; a result that could not be saved goes to the fail file
+    for position, result, future in writes:
+        error = future.exception()
+        if error is None:
+            continue
+        print(f"Error saving example {position}: {error}")
+        if result is not None:
+            unique_results.pop(position, None)
+            try:
+                convert_state_to_jsonl(unique_examples[position], f"{run_name}_fail.jsonl")
+            except Exception as e:
+                print(f"Error saving failed example {position}: {e}")
+
+    # Fan results back out to every input, in input order
+    results = [dict(unique_results[position]) for position in index_map if position in unique_results]
     
     return results
 
 
-def run_translation_pipeline(input_file: str, output_file: str, batch_size=4, preprocess=False):
-    """Run the translation workflow on the given input file and save results."""
-    data = get_json_data(input_file)
-    results = run(data, batch_size=batch_size, run_name=output_file, preprocess=preprocess)
+class RateLimiter:
+    """Allow at most `rpm` acquisitions in any rolling 60-second window."""
+
+    def __init__(self, rpm):
+        self.rpm = rpm
+        self._starts = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._starts and now - self._starts[0] >= 60:
+                    self._starts.popleft()
+                if len(self._starts) < self.rpm:
+                    self._starts.append(now)
+                    return
+                await asyncio.sleep(60 - (now - self._starts[0]))
+
+
+@retry(
+    wait=wait_random_exponential(min=5, max=60),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type((
+        anthropic.RateLimitError,
+        anthropic.APIConnectionError,
+        anthropic.InternalServerError,
+    )),
+    reraise=True,
+)
+async def _ainvoke_workflow(example):
+    """Run one example through the workflow, retrying it after transient provider errors.
+
+    Calls that completed before the error are served from the completion cache
+    on the retry, so only the remaining steps are sent to the API again.
+    """
+    return await optimizer_workflow.ainvoke(example, config={"recursion_limit": 50})
+
+
+async def run_async(data, run_name="run1", preprocess=False, rpm=40, max_concurrency=8, limiter=None):
+    """Run the translation workflow on all examples concurrently.
+
+    Each example starts as soon as a concurrency slot and the rate limit
+    allow it.
+
+    Args:
+        data (list): The list of dictionaries containing the data.
+        run_name (str): The name of the run to save the output files.
+        preprocess (bool): Whether to preprocess the data before running the workflow.
+        rpm (int): Maximum number of workflow runs started per minute.
+        max_concurrency (int): Maximum number of workflow runs in flight.
+        limiter (RateLimiter): Limiter shared with earlier calls, so the rpm
+            limit holds across them; a new one is created from rpm if omitted.
+    """
+    examples = _build_examples(data, preprocess)
+    unique_examples, index_map, copies = _dedupe(examples)
+
+    limiter = limiter or RateLimiter(rpm)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    write_lock = asyncio.Lock()
+    progress = tqdm(total=len(unique_examples), desc="Processing examples")
+
+    async def process(position):
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                result = await _ainvoke_workflow(unique_examples[position])
+            except Exception as e:
+                print(f"Error processing example: {e}")
+                async with write_lock:
+                    for _ in range(copies[position]):
+                        convert_state_to_jsonl(unique_examples[position], f"{run_name}_fail.jsonl")
+                progress.update(1)
+                return position, None
+        async with write_lock:
+            for _ in range(copies[position]):
+                convert_state_to_jsonl(result, f"{run_name}.jsonl")
+        progress.update(1)
+        return position, result
+
+    outcomes = await asyncio.gather(*[process(position) for position in range(len(unique_examples))])
+    progress.close()
+
+    unique_results = {position: result for position, result in outcomes if result is not None}
+    return [dict(unique_results[position]) for position in index_map if position in unique_results]
+
+
+def run_translation_pipeline(input_file: str, output_file: str, batch_size=4, preprocess=False, use_async=False, rpm=40, window_size=256, batch_api=False):
+    """Run the translation workflow on the given input file and save results.
+
+    The input is read incrementally, window_size records at a time, so memory
+    use does not grow with the size of the input file. With batch_api, each
+    window's source analyses are computed through the Message Batches API; the
+    batch for a window is submitted while the previous window is translated.
+    """
+    preload_examples()
+    records = iter_json_data(input_file)
+
+    def next_window():
+        return _build_examples(list(islice(records, window_size)), preprocess)
+
+    def windows():
+        # With batch_api, the next window's source analysis batch is submitted
+        # before the current window is translated, so batches run while the
+        # workflow works instead of one after another
+        data = next_window()
+        prefill = submit_batch_prefill(data) if batch_api and data else None
+        while data:
+            upcoming = next_window()
+            upcoming_prefill = submit_batch_prefill(upcoming) if batch_api and upcoming else None
+            collect_batch_prefill(prefill)
+            yield data
+            data, prefill = upcoming, upcoming_prefill
+
+    async def run_windows_async():
+        # One event loop and one limiter for the whole input, so the rpm
+        # limit also holds across window boundaries
+        limiter = RateLimiter(rpm)
+        for data in windows():
+            await run_async(data, run_name=output_file, max_concurrency=batch_size, limiter=limiter)
+
+    if use_async:
+        asyncio.run(run_windows_async())
+    else:
+        for data in windows():
+            run(data, batch_size=batch_size, run_name=output_file)
+    close_jsonl_writers()
+    close_glossary_writers()
+    if completion_cache.is_enabled():
+        cache_stats = completion_cache.stats()
+        print(f"Completion cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
     print(f"Translation process completed. Results saved in {output_file}")
 
 
@@ -61,11 +273,22 @@ def main():
     parser = argparse.ArgumentParser(description="Tibetan Translator CLI")
     parser.add_argument("--input", type=str, required=True, help="Path to input JSON file")
     parser.add_argument("--output", type=str, required=True, help="Path to output JSONL file")
-    parser.add_argument("--batch_size", type=int, default=4, help="Batch size for processing")
+    parser.add_argument("--batch_size", type=int, default=4, help="Maximum number of examples processed concurrently")
     parser.add_argument("--preprocess", action='store_true', help="Whether to preprocess data before running")
+    parser.add_argument("--async", dest="use_async", action='store_true', help="Process examples with asyncio under an --rpm rate limit")
+    parser.add_argument("--rpm", type=int, default=40, help="Maximum examples started per minute with --async")
+    parser.add_argument("--batch-api", dest="batch_api", action='store_true', help="Pre-compute source analyses through the Message Batches API (half price, asynchronous)")
+    parser.add_argument("--no-cache", dest="no_cache", action='store_true', help="Ignore and do not update the local completion cache")
+    parser.add_argument("--window_size", type=int, default=256, help="Number of input records read and processed at a time")
     
     args = parser.parse_args()
-    run_translation_pipeline(args.input, args.output, batch_size=args.batch_size, preprocess=args.preprocess)
+    if args.no_cache:
+        completion_cache.set_enabled(False)
+    run_translation_pipeline(
+        args.input, args.output, batch_size=args.batch_size, preprocess=args.preprocess,
+        use_async=args.use_async, rpm=args.rpm, window_size=args.window_size,
+        batch_api=args.batch_api
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from tibetan_translator.config import COMPLETION_CACHE_ENABLED, COMPLETION_CACHE_PATH
+from tibetan_translator.serialization import dumps
+
+logger = logging.getLogger("tibetan_translator.completion_cache")
+
+# Cache keys need not be cryptographic, so prefer the fastest hash available.
+try:
+    from blake3 import blake3 as _hash
+except ImportError:
+    try:
+        from xxhash import xxh3_128 as _hash
+    except ImportError:
+        def _hash(data):
+            return hashlib.blake2b(data, digest_size=16)
+
+# Completions are cached in two tiers: a bounded per-process LRU in front of a
+# SQLite table shared by every run. Each thread gets its own SQLite connection.
+MEMORY_CACHE_SIZE = 1024
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+_local = threading.local()
+_enabled = COMPLETION_CACHE_ENABLED
+
+# Hit/miss counters for this process, reported at the end of a run
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def set_enabled(enabled):
+    """Turn the completion cache on or off for the current process."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    """Return True if cached_invoke should read from and write to the cache."""
+    return _enabled
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    """Return the completion cache hits and misses counted in this process so far."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _connection():
+    """Return this thread's SQLite connection, creating the table on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        directory = os.path.dirname(COMPLETION_CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(COMPLETION_CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at INTEGER NOT NULL)"
+        )
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def _message_payload(message):
+    """Reduce a LangChain message or message dict to a (role, content) pair."""
+    if isinstance(message, dict):
+        return message.get("type") or message.get("role"), message["content"]
+    return message.type, message.content
+
+
+def _digest(payload):
+    return _hash(dumps(payload)).hexdigest()
+
+
+def make_key(namespace, llm, messages):
+    """Hash everything that determines a completion into a cache key.
+
+    The namespace names the call site and carries a version suffix that must be
+    bumped whenever the prompt wording changes, e.g. ``"source_analysis_v1"``.
+    """
+    return _digest(
+        {
+            "namespace": namespace,
+            "model": getattr(llm, "model", None),
+            "max_tokens": getattr(llm, "max_tokens", None),
+            "thinking": getattr(llm, "thinking", None),
+            "messages": [_message_payload(m) for m in messages],
+        }
+    )
+
+
+def make_params_key(namespace, params):
+    """Cache key for a native Anthropic Messages API request (see anthropic_client)."""
+    return _digest({"namespace": namespace, "params": params})
+
+
+def _remember(key, response):
+    """Put a completion in the in-memory LRU, evicting the least recently used one if full."""
+    with _memory_lock:
+        _memory_cache[key] = response
+        _memory_cache.move_to_end(key)
+        if len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def lookup(key):
+    """Return the cached completion for key, or None."""
+    with _memory_lock:
+        response = _memory_cache.get(key)
+        if response is not None:
+            _memory_cache.move_to_end(key)
+    if response is not None:
+        _count("hits")
+        return response
+    row = _connection().execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        _count("misses")
+        return None
+    _count("hits")
+    _remember(key, row[0])
+    return row[0]
+
+
+def store(key, response):
+    """Persist a completion under key."""
+    _remember(key, response)
+    conn = _connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO completions (key, response, created_at) VALUES (?, ?, ?)",
+        (key, response, int(time.time())),
+    )
+    conn.commit()
+
+
+def _default_extract(response):
+    return response.content
+
+
+def cached_invoke(llm, messages, *, namespace, extract=_default_extract):
+    """Invoke llm on messages, reusing a previously stored completion if there is one.
+
+    Args:
+        llm: A LangChain chat model.
+        messages (list): Prompt messages.
+        namespace (str): Versioned name of the call site, part of the cache key.
+        extract (callable): Turns the model response into the text that is cached.
+
+    Returns:
+        str: The completion text.
+    """
+    if not _enabled:
+        return extract(llm.invoke(messages))
+
+    key = make_key(namespace, llm, messages)
+    cached = lookup(key)
+    if cached is not None:
+        logger.debug("Completion cache hit for %s (%s)", namespace, key)
+        return cached
+
+    text = extract(llm.invoke(messages))
+    store(key, text)
+    return text
+
+
+async def cached_ainvoke(llm, messages, *, namespace, extract=_default_extract):
+    """Async variant of cached_invoke."""
+    if not _enabled:
+        return extract(await llm.ainvoke(messages))
+
+    key = make_key(namespace, llm, messages)
+    cached = lookup(key)
+    if cached is not None:
+        logger.debug("Completion cache hit for %s (%s)", namespace, key)
+        return cached
+
+    text = extract(await llm.ainvoke(messages))
+    store(key, text)
+    return text
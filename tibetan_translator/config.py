@@ -20,12 +20,32 @@ if "ANTHROPIC_API_KEY" not in os.environ:
 LLM_MODEL_NAME = "claude-3-7-sonnet-latest"
 MAX_TOKENS = 5000
 
+# Logging Configuration
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()  # Set LOG_LEVEL=DEBUG to trace prompts and parsing
+
 # File Paths
 GLOSSARY_CSV_PATH = "translation_glossary.csv"
 STATE_JSONL_PATH = "translation_states.jsonl"
 
+# Completion Cache
+# Identical prompts are answered from a local SQLite cache instead of the API
+COMPLETION_CACHE_ENABLED = os.environ.get("COMPLETION_CACHE", "1") != "0"
+COMPLETION_CACHE_PATH = os.environ.get("COMPLETION_CACHE_PATH", ".cache/completions.sqlite")
+
+# Message Batches
+# Seconds to wait for a message batch before cancelling it (batches expire after 24 hours)
+BATCH_TIMEOUT = float(os.environ.get("BATCH_TIMEOUT", 6 * 3600))
+
+# Commentary Settings
+# Combined-commentary inputs (source + commentaries) shorter than this many
+# characters are aggregated without extended thinking
+AGGREGATOR_THINKING_THRESHOLD = 4000
+
 # Translation Settings
 MAX_TRANSLATION_ITERATIONS = 3 # Maximum iterations for translation quality improvements
+# Draft, self-critique and revise the first translation in one structured call
+# instead of starting the evaluator loop from an unrevised draft
+SELF_REVISION_ENABLED = os.environ.get("SELF_REVISION", "0") == "1"
 
 # Formatting Settings
 PRESERVE_SOURCE_FORMATTING = True  # Ensure translation matches source text formatting
@@ -2,6 +2,7 @@ import json
 import logging
 from typing import List, Literal, TypedDict, Any, Union
 from pydantic import BaseModel, Field, field_validator
+from tibetan_translator import serialization
 
 # Setup model-specific logger
 logger = logging.getLogger("tibetan_translator.models")
@@ -39,33 +40,37 @@ class GlossaryExtraction(BaseModel):
         This is especially important for Chinese and other non-Latin languages where
         JSON parsing might return a string instead of properly parsing to a list.
         """
-        logger.debug(f"GlossaryExtraction validator received entries of type: {type(v)}")
+        # Fast path: structured output normally hands us a list already
+        if type(v) is list:
+            return v
+        
+        logger.debug("GlossaryExtraction validator received entries of type: %s", type(v))
         
-        # If it's already a list, return it
+        # A list subclass is fine as well
         if isinstance(v, list):
-            logger.debug(f"Entries is already a list with {len(v)} items")
+            logger.debug("Entries is already a list with %d items", len(v))
             return v
             
         # If it's a string, try to parse it as JSON
         if isinstance(v, str):
-            logger.debug(f"Entries is a string, attempting to parse as JSON. Content sample: {v[:200]}...")
+            logger.debug("Entries is a string, attempting to parse as JSON. Content sample: %.200s...", v)
             try:
-                parsed = json.loads(v)
-                logger.debug(f"Successfully parsed string to {type(parsed)}")
+                parsed = serialization.loads(v)
+                logger.debug("Successfully parsed string to %s", type(parsed))
                 
                 # If parsing gave us a list, return it
                 if isinstance(parsed, list):
-                    logger.debug(f"Parsed to a list with {len(parsed)} items")
+                    logger.debug("Parsed to a list with %d items", len(parsed))
                     return parsed
                 else:
-                    logger.error(f"Parsed JSON is not a list but {type(parsed)}")
+                    logger.error("Parsed JSON is not a list but %s", type(parsed))
                     raise ValueError(f"Expected a list after parsing string, got {type(parsed)}")
             except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse entries string as JSON: {str(e)}")
+                logger.error("Failed to parse entries string as JSON: %s", e)
                 raise ValueError(f"Invalid JSON string for entries: {str(e)}")
         
         # If we got here, it's neither a list nor a string that parses to a list
-        logger.error(f"Invalid type for entries: {type(v)}")
+        logger.error("Invalid type for entries: %s", type(v))
         raise ValueError(f"entries must be a list or a string containing a JSON list, got {type(v)}")
 
 class LanguageCheck(BaseModel):
@@ -103,6 +108,26 @@ class Feedback(BaseModel):
 
 class Translation_extractor(BaseModel):
     extracted_translation: str = Field("extracted translation with exact format from the Respond")
+class SelfRevisedTranslation(BaseModel):
+    draft: str = Field(
+        description="First draft translation of the source text",
+    )
+    critique: str = Field(
+        description="Critique of the draft: accuracy against the commentary, fluency, terminology and formatting",
+    )
+    final_translation: str = Field(
+        description="Revised translation addressing every point of the critique, with the source text's formatting",
+    )
+    grade: Literal["bad", "okay", "good", "great"] = Field(
+        description="Self-assessed quality of the final translation",
+    )
+class DualTranslation(BaseModel):
+    extracted_translation: str = Field(
+        description="Translation extracted with exact format from the first response",
+    )
+    extracted_plain_translation: str = Field(
+        description="Plain language translation extracted with exact format from the second response",
+    )
 class Translation(BaseModel):
     format_matched: bool = Field(
         description="Evaluate if translation preserves source text's formatting such as linebreaks",
@@ -6,14 +6,16 @@ from tibetan_translator.prompts import (
     get_translation_prompt,
     
 )
-from tibetan_translator.utils import llm, llm_thinking, get_combined_commentary_prompt, create_source_analysis
+from tibetan_translator.config import AGGREGATOR_THINKING_THRESHOLD
+from tibetan_translator.completion_cache import cached_invoke
+from tibetan_translator.utils import llm, llm_thinking, structured_llm, get_combined_commentary_prompt, create_source_analysis, extract_text, log_cache_usage
 
 
 
 def extract_commentary_key_points(commentary: str) -> List[KeyPoint]:
     """Extract key points from commentary with structured output."""
     prompt = get_key_points_extraction_prompt(commentary)
-    result = llm.with_structured_output(CommentaryPoints).invoke(prompt)
+    result = structured_llm(CommentaryPoints).invoke(prompt)
     return result.points
 
 
@@ -30,7 +32,7 @@ def commentary_translator_1(state: State):
         language=state.get('language', 'English')
     )
     # commentary_1 = llm.invoke(prompt)
-    # commentary_1_ = llm.with_structured_output(Translation_extractor).invoke(get_translation_prompt(state['commentary1'], commentary_1.content))
+    # commentary_1_ = structured_llm(Translation_extractor).invoke(get_translation_prompt(state['commentary1'], commentary_1.content))
     return {"commentary1": state['commentary1'], "commentary1_translation": state['commentary1']}
 
 
@@ -47,7 +49,7 @@ def commentary_translator_2(state: State):
         language=state.get('language', 'English')
     )
     # commentary_2 = llm.invoke(prompt)
-    # commentary_2_ = llm.with_structured_output(Translation_extractor).invoke(get_translation_prompt(state['commentary2'], commentary_2.content))
+    # commentary_2_ = structured_llm(Translation_extractor).invoke(get_translation_prompt(state['commentary2'], commentary_2.content))
     return {"commentary2": state['commentary2'], "commentary2_translation": state['commentary2']}
 
 
@@ -64,10 +66,42 @@ def commentary_translator_3(state: State):
         language=state.get('language', 'English')
     )
     # commentary_3 = llm.invoke(prompt)
-    # commentary_3_ = llm.with_structured_output(Translation_extractor).invoke(get_translation_prompt(state['commentary3'], commentary_3.content))
+    # commentary_3_ = structured_llm(Translation_extractor).invoke(get_translation_prompt(state['commentary3'], commentary_3.content))
     return {"commentary3": state['commentary3'], "commentary3_translation": state['commentary3']}
 
 
+def commentary_translators(state: State):
+    """Run all three commentary translators as a single workflow step.
+    
+    None of them calls an LLM, so running them as one node saves the
+    scheduling of three parallel branches and their join before the aggregator.
+    """
+    return {
+        **commentary_translator_1(state),
+        **commentary_translator_2(state),
+        **commentary_translator_3(state),
+    }
+
+
+def format_commentaries(commentaries):
+    """Render the available commentaries as the aggregator's dynamic prompt payload.
+    
+    Args:
+        commentaries (list): Commentary texts by position; None for a missing one.
+    """
+    return "".join(
+        f"Commentary {number}:\n{text}\n\n"
+        for number, text in enumerate(commentaries, start=1)
+        if text is not None
+    )
+
+
+def _aggregator_text(response):
+    """Log prompt-cache usage and return the answer text (skipping any thinking blocks)."""
+    log_cache_usage(response, "aggregator")
+    return extract_text(response)
+
+
 def aggregator(state: State):
     """
     Combine commentaries based on the following logic:
@@ -105,13 +139,11 @@ def aggregator(state: State):
             return {"combined_commentary": state['commentary3_translation'], "commentary_source": "traditional"}
     
     # If we have multiple commentaries, combine them using LLM
-    combined = ""
-    if has_commentary1:
-        combined += f"Commentary 1:\n{state['commentary1_translation']}\n\n"
-    if has_commentary2:
-        combined += f"Commentary 2:\n{state['commentary2_translation']}\n\n"
-    if has_commentary3:
-        combined += f"Commentary 3:\n{state['commentary3_translation']}\n\n"
+    combined = format_commentaries([
+        state['commentary1_translation'] if has_commentary1 else None,
+        state['commentary2_translation'] if has_commentary2 else None,
+        state['commentary3_translation'] if has_commentary3 else None,
+    ])
     
     # Get the target language
     language = state.get('language', 'English')
@@ -124,24 +156,10 @@ def aggregator(state: State):
         language=language
     )
     
-    # Use the thinking LLM for analysis
-    response = llm_thinking.invoke(prompt_messages)
-    
-    # Extract content from thinking response
-    commentary_content = ""
-    
-    if isinstance(response, list):
-        # Handle thinking output format, extracting only the text part
-        for chunk in response:
-            if isinstance(chunk, dict) and chunk.get('type') == 'text':
-                commentary_content = chunk.get('text', '')
-    elif hasattr(response, 'content'):
-        if isinstance(response.content, list) and len(response.content) > 1:
-            # Extract text from the second element (typical thinking response structure)
-            commentary_content = response.content[1].get('text', '')
-        else:
-            commentary_content = response.content
-    else:
-        commentary_content = str(response)
+    # Extended thinking only pays off on long inputs; short verses use the standard llm
+    complexity = len(state['source']) + len(combined)
+    model = llm_thinking if complexity > AGGREGATOR_THINKING_THRESHOLD else llm
+    # Repeat runs over the same verse and commentaries are served from the completion cache
+    commentary_content = cached_invoke(model, prompt_messages, namespace="aggregator_v1", extract=_aggregator_text)
     
     return {"combined_commentary": commentary_content, "commentary_source": "traditional"}
\ No newline at end of file
@@ -1,26 +1,124 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import anthropic
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 from tibetan_translator.models import State, Feedback, CommentaryVerification, LanguageCheck
 from tibetan_translator.prompts import (
     get_verification_prompt,
     get_translation_evaluation_prompt,
     get_language_check_prompt
 )
-from tibetan_translator.utils import llm, llm_thinking, dict_to_text
+from tibetan_translator.utils import llm_thinking, dict_to_text, cached_structured_invoke
 from tibetan_translator.config import MAX_FORMAT_ITERATIONS
 
 
+# Transient provider failures (rate limits, overload, dropped connections) are
+# retried with jittered exponential backoff; anything else fails immediately.
+_retry_transient = retry(
+    wait=wait_random_exponential(min=1, max=30),
+    stop=stop_after_attempt(4),
+    retry=retry_if_exception_type((
+        anthropic.RateLimitError,
+        anthropic.APIConnectionError,
+        anthropic.InternalServerError,
+    )),
+    reraise=True,
+)
+
+
+@_retry_transient
 def verify_against_commentary(translation: str, combined_commentary: str, language: str = "English") -> CommentaryVerification:
     """Verify translation against commentary."""
     verification_prompt = get_verification_prompt(translation, combined_commentary, language=language)
     # Use standard llm with structured output since thinking doesn't support structured output
-    verification = llm.with_structured_output(CommentaryVerification).invoke(verification_prompt)
+    verification = cached_structured_invoke(CommentaryVerification, verification_prompt, namespace="verification_v1")
     return verification
 
 
+# Runs the commentary verification alongside the LLM language check
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="evaluation")
+
+
+# Unicode blocks of the scripts translations are written in
+_SCRIPT_RANGES = (
+    ("Latin", 0x0041, 0x024F),
+    ("Cyrillic", 0x0400, 0x04FF),
+    ("Devanagari", 0x0900, 0x097F),
+    ("Thai", 0x0E00, 0x0E7F),
+    ("Tibetan", 0x0F00, 0x0FFF),
+    ("Hangul", 0x1100, 0x11FF),
+    ("Han", 0x3400, 0x4DBF),
+    ("Han", 0x4E00, 0x9FFF),
+    ("Hangul", 0xAC00, 0xD7AF),
+    ("Han", 0xF900, 0xFAFF),
+)
+
+_LANGUAGE_SCRIPTS = {
+    "english": "Latin", "french": "Latin", "german": "Latin", "spanish": "Latin",
+    "italian": "Latin", "portuguese": "Latin", "vietnamese": "Latin",
+    "russian": "Cyrillic", "hindi": "Devanagari", "thai": "Thai",
+    "chinese": "Han", "korean": "Hangul",
+}
+
+# Scripts that are only used by one of the languages above, so text written
+# entirely in them needs no LLM to confirm its language. Devanagari is not one
+# of them: untranslated Sanskrit is written in it as well as Hindi.
+_SELF_IDENTIFYING_SCRIPTS = {"Thai", "Han", "Hangul"}
+
+# Below this many letters the script counts are not trusted either way
+_MIN_LETTERS = 20
+
+
+def _script_of(char):
+    code = ord(char)
+    for script, start, end in _SCRIPT_RANGES:
+        if start <= code <= end:
+            return script
+    return None
+
+
+def quick_language_check(translation: str, language: str = "English"):
+    """Decide the language check from the text's Unicode scripts when that is conclusive.
+
+    Returns a LanguageCheck when most letters are in the wrong script, or when
+    nearly all are in a script only the target language uses. Returns None when
+    the script alone cannot tell, e.g. English vs. French.
+    """
+    script = _LANGUAGE_SCRIPTS.get(language.lower())
+    if script is None:
+        return None
+
+    counts = Counter(_script_of(char) for char in translation if char.isalpha())
+    total = sum(counts.values())
+    if total < _MIN_LETTERS:
+        return None
+
+    share = counts[script] / total
+    if share < 0.5:
+        dominant = counts.most_common(1)[0][0] or "an unrecognized"
+        return LanguageCheck(
+            is_target_language=False,
+            language_issues=f"The text is mostly written in {dominant} script, not the {script} script used for {language}.",
+        )
+    if share >= 0.95 and script in _SELF_IDENTIFYING_SCRIPTS:
+        return LanguageCheck(is_target_language=True, language_issues="")
+    return None
+
+
+def _llm_language_check(translation: str, language: str) -> LanguageCheck:
+    """Ask the LLM whether the translation is in the target language."""
+    language_check_prompt = get_language_check_prompt(translation, language=language)
+    return cached_structured_invoke(LanguageCheck, language_check_prompt, namespace="language_check_v1")
+
+
 def check_translation_language(translation: str, language: str = "English") -> LanguageCheck:
     """Check if the translation is in the target language."""
-    language_check_prompt = get_language_check_prompt(translation, language=language)
-    language_check = llm.with_structured_output(LanguageCheck).invoke(language_check_prompt)
-    return language_check
+    # The LLM is only asked when the script of the text is not conclusive
+    language_check = quick_language_check(translation, language=language)
+    if language_check is not None:
+        return language_check
+    return _llm_language_check(translation, language)
 
 def llm_call_evaluator(state: State):
     """Evaluate translation quality AND formatting with comprehensive verification."""
@@ -28,11 +126,25 @@ def llm_call_evaluator(state: State):
     
     language = state.get('language', 'English')
     
-    # First check if the translation is in the target language
-    language_check = check_translation_language(state['translation'][-1], language=language)
+    translation = state['translation'][-1]
+    
+    # First check if the translation is in the target language. When the LLM
+    # has to be asked about text that is already mostly in the target script
+    # (so it will very likely pass), the independent commentary verification
+    # is started at the same time rather than after the check returns.
+    verification_future = None
+    language_check = quick_language_check(translation, language=language)
+    if language_check is None:
+        if language.lower() in _LANGUAGE_SCRIPTS:
+            verification_future = _executor.submit(
+                verify_against_commentary, translation, state['combined_commentary'], language=language
+            )
+        language_check = _llm_language_check(translation, language)
     
     # If not in target language, return early with language issue feedback
     if not language_check.is_target_language:
+        if verification_future is not None:
+            verification_future.cancel()
         language_feedback = f"WRONG LANGUAGE: Translation is not in {language}. {language_check.language_issues}"
         feedback_entry = f"Iteration {state['itteration']} - LANGUAGE ERROR\n"
         feedback_entry += f"In Target Language: False\n"
@@ -47,16 +159,11 @@ def llm_call_evaluator(state: State):
         }
     
     # Only proceed with full evaluation if language is correct
-    try:
-        verification = verify_against_commentary(
-            state['translation'][-1], 
-            state['combined_commentary'],
-            language=language
-        )
-    except Exception as e:
-        print(f"Verification error: {e}")
+    if verification_future is not None:
+        verification = verification_future.result()
+    else:
         verification = verify_against_commentary(
-            state['translation'][-1], 
+            translation, 
             state['combined_commentary'],
             language=language
         )
@@ -68,7 +175,7 @@ def llm_call_evaluator(state: State):
     )
     
     # Use standard llm with structured output for combined evaluation
-    evaluation = llm.with_structured_output(Feedback).invoke(prompt)
+    evaluation = cached_structured_invoke(Feedback, prompt, namespace="evaluation_v1")
     
     # Create comprehensive feedback entry with both content and formatting feedback
     feedback_entry = f"Iteration {state['itteration']} - Grade: {evaluation.grade}\n"
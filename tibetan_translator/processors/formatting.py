@@ -3,7 +3,7 @@ from tibetan_translator.prompts import (
     get_formatting_feedback_prompt,
     get_translation_prompt
 )
-from tibetan_translator.utils import llm
+from tibetan_translator.utils import llm, structured_llm
 
 
 def formater(state: State): 
@@ -13,7 +13,7 @@ def formater(state: State):
         language=state.get('language', 'English')
     )
     msg = llm.invoke(prompt)
-    formatted_translation = llm.with_structured_output(Translation_extractor).invoke(get_translation_prompt(state['source'], msg.content))
+    formatted_translation = structured_llm(Translation_extractor).invoke(get_translation_prompt(state['source'], msg.content))
     
     state["translation"].append(formatted_translation.extracted_translation)
     return {
@@ -29,7 +29,7 @@ def format_evaluator_feedback(state: State):
         state['source'], state['translation'][-1], state['format_feedback_history'],
         language=state.get('language', 'English')
     )
-    review = llm.with_structured_output(Translation).invoke(prompt)
+    review = structured_llm(Translation).invoke(prompt)
     
     if review.format_matched:
         return {
@@ -1,10 +1,15 @@
-import json
+import atexit
+import csv
 import logging
-import pandas as pd
+import operator
+import os
+import re
+import threading
 from typing import List, Any
+from tibetan_translator import serialization
 from tibetan_translator.models import State, GlossaryEntry, GlossaryExtraction
 from tibetan_translator.prompts import get_glossary_extraction_prompt
-from tibetan_translator.utils import llm, logger
+from tibetan_translator.utils import llm, logger, cached_structured_invoke
 
 # Create glossary-specific logger
 glossary_logger = logging.getLogger("tibetan_translator.glossary")
@@ -17,12 +22,71 @@ if not glossary_logger.handlers:
     # Don't propagate to avoid duplicate logs
     glossary_logger.propagate = False
 
+# Fields every GlossaryEntry needs; missing ones are filled with "" when
+# entries are recovered from a raw (non-structured) response.
+REQUIRED_FIELDS = ('tibetan_term', 'translation', 'context',
+                   'commentary_reference', 'category', 'entity_category')
+
+# Column order of the glossary CSV
+CSV_COLUMNS = ('tibetan_term', 'translation', 'category', 'context', 'commentary_reference', 'entity_category')
+
+# Reads a GlossaryEntry's fields as one CSV row tuple in column order
+_csv_row = operator.attrgetter(*CSV_COLUMNS)
+
+# Start of a JSON array of objects in a raw response
+_ARRAY_START_RE = re.compile(r'\[\s*\{')
+
+
+def _json_arrays(text):
+    """Yield each balanced JSON array of objects embedded in text, in order.
+
+    Brackets are matched in a single forward scan that skips over string
+    literals, so prose before the array or trailing text after it (including
+    further brackets) does not affect where the array ends.
+    """
+    for match in _ARRAY_START_RE.finditer(text):
+        start = match.start()
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '[{':
+                depth += 1
+            elif char in ']}':
+                depth -= 1
+                if depth == 0:
+                    yield text[start:i + 1]
+                    break
+
+
+def _entry_from_dict(entry):
+    """Build a GlossaryEntry from one parsed JSON object of a raw response.
+
+    Every GlossaryEntry field is a plain string, so when the parsed values
+    already are strings the entry is constructed without re-validation.
+    Anything else goes through normal pydantic validation.
+    """
+    values = {k: entry.get(k, "") for k in REQUIRED_FIELDS}
+    if all(type(v) is str for v in values.values()):
+        return GlossaryEntry.model_construct(**values)
+    return GlossaryEntry(**values)
+
 
 def extract_glossary(state: State) -> List[GlossaryEntry]:
     """Extract technical terms and their translations into a glossary."""
     language = state.get('language', 'English')
     commentary_source = state.get('commentary_source', 'traditional')
-    glossary_logger.info(f"Extracting glossary for language: {language}, commentary source: {commentary_source}")
+    glossary_logger.info("Extracting glossary for language: %s, commentary source: %s", language, commentary_source)
     
     try:
         glossary_prompt = get_glossary_extraction_prompt(
@@ -31,35 +95,32 @@ def extract_glossary(state: State) -> List[GlossaryEntry]:
         )
         
         # Log the language and target language-specific instructions
-        glossary_logger.debug(f"Using {language} for glossary extraction")
+        glossary_logger.debug("Using %s for glossary extraction", language)
         
-        # Create structured output extractor
-        extractor = llm.with_structured_output(GlossaryExtraction)
-        glossary_logger.debug("Created structured output extractor for GlossaryExtraction")
-        
-        # Invoke the model with error handling
+        # Invoke the model with error handling; a verse whose final translation
+        # was already processed is served from the completion cache
         try:
             glossary_logger.debug("Invoking LLM for glossary extraction")
-            result = extractor.invoke(glossary_prompt)
-            glossary_logger.debug(f"LLM returned result type: {type(result)}")
+            result = cached_structured_invoke(GlossaryExtraction, glossary_prompt, namespace="glossary_v1")
+            glossary_logger.debug("LLM returned result type: %s", type(result))
             
             # Check structure of result
             if hasattr(result, 'entries'):
                 entries = result.entries
-                glossary_logger.info(f"Successfully extracted {len(entries)} glossary entries")
-                glossary_logger.debug(f"Entries type: {type(entries)}")
+                glossary_logger.info("Successfully extracted %s glossary entries", len(entries))
+                glossary_logger.debug("Entries type: %s", type(entries))
                 
                 # Log a sample of the entries for debugging
                 if entries and len(entries) > 0:
-                    glossary_logger.debug(f"First entry sample: {entries[0]}")
+                    glossary_logger.debug("First entry sample: %s", entries[0])
                 
                 return entries
             else:
-                glossary_logger.error(f"LLM result does not have entries attribute: {result}")
+                glossary_logger.error("LLM result does not have entries attribute: %s", result)
                 return []
                 
         except Exception as e:
-            glossary_logger.error(f"Error during LLM invocation: {str(e)}")
+            glossary_logger.error("Error during LLM invocation: %s", e)
             
             # If we're processing Chinese, try to handle the raw response
             if language == "Chinese":
@@ -67,110 +128,128 @@ def extract_glossary(state: State) -> List[GlossaryEntry]:
                 try:
                     # Try to get raw completion without structured output
                     raw_response = llm.invoke(glossary_prompt)
-                    glossary_logger.debug(f"Raw response type: {type(raw_response)}")
+                    glossary_logger.debug("Raw response type: %s", type(raw_response))
                     
                     # Extract content from AIMessage if needed
                     response_text = ""
                     if hasattr(raw_response, 'content'):
                         response_text = raw_response.content
-                        glossary_logger.debug(f"Extracted content from AIMessage: {response_text[:200]}...")
+                        glossary_logger.debug("Extracted content from AIMessage: %.200s...", response_text)
                     elif isinstance(raw_response, str):
                         response_text = raw_response
                     
-                    # Try to extract JSON from the response
-                    if response_text:
-                        # Look for JSON pattern
-                        import re
-                        json_pattern = r'\[\s*\{.*\}\s*\]'
-                        json_matches = re.search(json_pattern, response_text, re.DOTALL)
+                    # Try each JSON array of objects in the response until one
+                    # yields entries
+                    for json_str in _json_arrays(response_text):
+                        glossary_logger.debug("Found JSON array in response: %.200s...", json_str)
                         
-                        if json_matches:
-                            json_str = json_matches.group(0)
-                            glossary_logger.debug(f"Found JSON pattern in response: {json_str[:200]}...")
-                            
-                            try:
-                                # Try to clean up the JSON string for better parsing
-                                # Remove any non-JSON text that might have been included
-                                clean_json = json_str.strip()
-                                glossary_logger.debug(f"Cleaned JSON: {clean_json[:200]}...")
-                                
-                                # Parse the JSON
-                                entries_list = json.loads(clean_json)
-                                glossary_logger.debug(f"Parsed JSON to list with {len(entries_list)} items")
-                                
-                                # Convert to GlossaryEntry objects
-                                entries = []
-                                for entry in entries_list:
-                                    try:
-                                        # Log each entry for debugging
-                                        glossary_logger.debug(f"Processing entry: {entry}")
-                                        
-                                        # Ensure all required fields exist
-                                        required_fields = ['tibetan_term', 'translation', 'context', 
-                                                          'commentary_reference', 'category', 'entity_category']
-                                        for field in required_fields:
-                                            if field not in entry:
-                                                entry[field] = ""
-                                        
-                                        # Create GlossaryEntry object
-                                        glossary_entry = GlossaryEntry(**entry)
-                                        entries.append(glossary_entry)
-                                    except Exception as entry_e:
-                                        glossary_logger.error(f"Error processing entry {entry}: {str(entry_e)}")
-                                
-                                if entries:
-                                    glossary_logger.info(f"Recovered {len(entries)} entries from raw response")
-                                    return entries
-                                else:
-                                    glossary_logger.warning("No valid entries could be created from JSON")
-                            except Exception as json_e:
-                                glossary_logger.error(f"Failed to parse extracted JSON: {str(json_e)}")
-                                
-                        # Try one more approach - look for a complete JSON array structure
                         try:
-                            # Find anything that looks like a complete JSON array
-                            array_pattern = r'\[\s*\{[^\[\]]*\}\s*(?:,\s*\{[^\[\]]*\}\s*)*\]'
-                            array_matches = re.search(array_pattern, response_text, re.DOTALL)
-                            
-                            if array_matches:
-                                array_json = array_matches.group(0)
-                                glossary_logger.debug(f"Found complete JSON array: {array_json[:200]}...")
-                                
-                                # Parse the JSON
-                                entries_list = json.loads(array_json)
-                                
-                                # Create GlossaryEntry objects
-                                entries = []
-                                for entry in entries_list:
-                                    # Ensure all required fields
-                                    required_fields = ['tibetan_term', 'translation', 'context', 
-                                                      'commentary_reference', 'category', 'entity_category']
-                                    for field in required_fields:
-                                        if field not in entry:
-                                            entry[field] = ""
-                                            
-                                    entries.append(GlossaryEntry(**entry))
+                            entries_list = serialization.loads(json_str)
+                        except ValueError as json_e:
+                            glossary_logger.error("Failed to parse extracted JSON: %s", json_e)
+                            continue
+                        glossary_logger.debug("Parsed JSON to list with %s items", len(entries_list))
+                        
+                        # Convert to GlossaryEntry objects
+                        entries = []
+                        for entry in entries_list:
+                            try:
+                                # Log each entry for debugging
+                                glossary_logger.debug("Processing entry: %s", entry)
                                 
-                                glossary_logger.info(f"Recovered {len(entries)} entries from complete JSON array")
-                                return entries
-                        except Exception as array_e:
-                            glossary_logger.error(f"Failed to parse complete JSON array: {str(array_e)}")
+                                # Create GlossaryEntry object, keeping only the required fields
+                                entries.append(_entry_from_dict(entry))
+                            except Exception as entry_e:
+                                glossary_logger.error("Error processing entry %s: %s", entry, entry_e)
+                        
+                        if entries:
+                            glossary_logger.info("Recovered %s entries from raw response", len(entries))
+                            return entries
+                        glossary_logger.warning("No valid entries could be created from JSON")
                     
                 except Exception as recovery_e:
-                    glossary_logger.error(f"Failed recovery attempt: {str(recovery_e)}")
+                    glossary_logger.error("Failed recovery attempt: %s", recovery_e)
             
             # Return empty list if all else fails
             glossary_logger.warning("Returning empty glossary entries list due to errors")
             return []
     
     except Exception as outer_e:
-        glossary_logger.error(f"Error in extract_glossary: {str(outer_e)}")
+        glossary_logger.error("Error in extract_glossary: %s", outer_e)
         return []
 
 
+class GlossaryWriter:
+    """Append-only writer for a glossary CSV, shared by every verse in a run.
+
+    The file is opened once and kept open. Entries whose
+    (tibetan_term, translation) pair is already in the file are skipped; the
+    pairs are read from disk once when the writer is created. A lock makes
+    write() safe to call from concurrent workflow branches.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.seen = set()
+        if os.path.exists(filename):
+            with open(filename, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    self.seen.add((row.get('tibetan_term', ''), row.get('translation', '')))
+        write_header = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self.file = open(filename, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        if write_header:
+            self.writer.writerow(CSV_COLUMNS)
+
+    def write(self, entries):
+        """Append entries not already in the file; return how many were written."""
+        with self.lock:
+            # Skip terms already recorded with the same translation
+            new_entries = []
+            for entry in entries:
+                key = (entry.tibetan_term, entry.translation)
+                if key not in self.seen:
+                    self.seen.add(key)
+                    new_entries.append(entry)
+            self.writer.writerows(map(_csv_row, new_entries))
+            self.file.flush()
+        return len(new_entries)
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+
+
+_glossary_writers = {}
+_glossary_writers_lock = threading.Lock()
+
+
+def get_glossary_writer(filename="translation_glossary.csv"):
+    """Return the process-wide GlossaryWriter for filename, opening it on first use."""
+    with _glossary_writers_lock:
+        writer = _glossary_writers.get(filename)
+        if writer is None:
+            writer = _glossary_writers[filename] = GlossaryWriter(filename)
+        return writer
+
+
+def close_glossary_writers():
+    """Flush and close every glossary CSV opened by get_glossary_writer."""
+    with _glossary_writers_lock:
+        while _glossary_writers:
+            _, writer = _glossary_writers.popitem()
+            writer.close()
+
+atexit.register(close_glossary_writers)
+
+
 def generate_glossary_csv(entries: List[GlossaryEntry], filename: str = "translation_glossary.csv"):
     """Generate or append to a CSV file from glossary entries."""
-    glossary_logger.debug(f"Generating CSV from {len(entries)} entries")
+    glossary_logger.debug("Generating CSV from %s entries", len(entries))
     
     # Safety check - if no entries, create a minimal placeholder
     if not entries:
@@ -187,58 +266,27 @@ def generate_glossary_csv(entries: List[GlossaryEntry], filename: str = "transla
         entries = [placeholder]
     
     try:
-        # Convert entries to dictionaries
-        entry_dicts = []
-        for entry in entries:
-            try:
-                entry_dict = entry.dict()
-                entry_dicts.append(entry_dict)
-            except Exception as e:
-                glossary_logger.error(f"Error converting entry to dict: {str(e)}")
-                
-        # Create DataFrame
-        new_df = pd.DataFrame(entry_dicts)
-        
-        # Ensure all required columns exist
-        column_order = ['tibetan_term', 'translation', 'category', 'context', 'commentary_reference', 'entity_category']
-        for col in column_order:
-            if col not in new_df.columns:
-                glossary_logger.warning(f"Column '{col}' missing, adding empty column")
-                new_df[col] = ""
-                
-        # Reorder columns
-        new_df = new_df[column_order]
-        
-        # Save to CSV
-        try:
-            existing_df = pd.read_csv(filename, encoding='utf-8')
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            combined_df.to_csv(filename, index=False, encoding='utf-8')
-        except FileNotFoundError:
-            new_df.to_csv(filename, index=False, encoding='utf-8')
-        
+        written = get_glossary_writer(filename).write(entries)
+        glossary_logger.debug("Wrote %s new of %s entries", written, len(entries))
         return filename
         
     except Exception as e:
-        glossary_logger.error(f"Error in generate_glossary_csv: {str(e)}")
-        # Create an empty CSV with the right structure as fallback
-        fallback_df = pd.DataFrame(columns=column_order)
-        fallback_df.to_csv(filename, index=False, encoding='utf-8')
+        glossary_logger.error("Error in generate_glossary_csv: %s", e)
         return filename
 
 
 def generate_glossary(state: State):
     """Generate glossary and save to CSV."""
-    glossary_logger.info(f"Generating glossary for language: {state.get('language', 'English')}")
+    glossary_logger.info("Generating glossary for language: %s", state.get('language', 'English'))
     
     try:
         # Extract glossary entries
         entries = extract_glossary(state)
-        glossary_logger.info(f"Extracted {len(entries)} glossary entries")
+        glossary_logger.info("Extracted %s glossary entries", len(entries))
         
         # Generate CSV file
         filename = generate_glossary_csv(entries)
-        glossary_logger.info(f"Saved glossary to {filename}")
+        glossary_logger.info("Saved glossary to %s", filename)
         
         # Make sure to preserve plaintext_translation in the return state
         return {
@@ -246,7 +294,7 @@ def generate_glossary(state: State):
             "plaintext_translation": state.get("plaintext_translation", "")
         }
     except Exception as e:
-        glossary_logger.error(f"Error in generate_glossary: {str(e)}")
+        glossary_logger.error("Error in generate_glossary: %s", e)
         # Return empty glossary to prevent workflow failures
         return {
             "glossary": [],
@@ -1,13 +1,16 @@
 import json
 import logging
+import random
 import sys
+import time
 from typing import Dict, List, Any, Optional, Union
 import pandas as pd
 from tqdm import tqdm
 from pydantic import BaseModel, Field
 
+from tibetan_translator import serialization
 from tibetan_translator.models import State, GlossaryEntry
-from tibetan_translator.utils import llm
+from tibetan_translator.utils import structured_llm
 from tibetan_translator.config import LLM_MODEL_NAME, MAX_TOKENS
 
 # Set up dual logging: console for progress, file for details
@@ -73,7 +76,7 @@ def analyze_term_frequencies(glossaries: List[Dict[str, Any]]) -> pd.DataFrame:
         DataFrame with tibetan_term and translation_freq columns
     """
     logger.info("📊 Analyzing term frequencies across corpus...")
-    logger.debug(f"Processing {len(glossaries)} glossary entries")
+    logger.debug("Processing %s glossary entries", len(glossaries))
     
     # Initialize data structures
     term_translations = {}
@@ -112,8 +115,8 @@ def analyze_term_frequencies(glossaries: List[Dict[str, Any]]) -> pd.DataFrame:
         })
     
     result_df = pd.DataFrame(data)
-    logger.info(f"✅ Term frequency analysis complete: found {len(data)} unique terms")
-    logger.info(f"  - {len(result_df[result_df['translation_count'] > 1])} terms have multiple translations")
+    logger.info("✅ Term frequency analysis complete: found %s unique terms", len(data))
+    logger.info("  - %s terms have multiple translations", len(result_df[result_df['translation_count'] > 1]))
     
     return result_df
 
@@ -135,7 +138,7 @@ def generate_standardization_examples(glossary: pd.DataFrame, corpus: List[Dict[
     examples = []
     multi_translation_terms = glossary[glossary['translation_count'] > 1]
     
-    logger.debug(f"Generating examples for {len(multi_translation_terms)} terms with multiple translations")
+    logger.debug("Generating examples for %s terms with multiple translations", len(multi_translation_terms))
     
     # Create translation file for lookup
     translation_file = pd.DataFrame([
@@ -164,20 +167,18 @@ def generate_standardization_examples(glossary: pd.DataFrame, corpus: List[Dict[
         
         # Only proceed if we found examples
         if len(samples) > 0 :
-            # Build the example text
-            example = f"Usage examples:\n\n"
+            # Build the example text from parts joined once at the end
+            parts = ["Usage examples:\n\n"]
             
             # Add each sample
-            for _, sample in samples.iterrows():
-                example += f"Sanskrit: {sample['sanskrit']}\n"
-                example += f"Source: {sample['source']}\n"
-                example += f"Translation: {sample['translation']}\n\n"
+            for sanskrit, source, translation in zip(samples['sanskrit'], samples['source'], samples['translation']):
+                parts.append(f"Sanskrit: {sanskrit}\nSource: {source}\nTranslation: {translation}\n\n")
             
             # Add the Tibetan term and translation candidates
-            example += f"Tibetan Term: {tibetan_term} Translation: {term_row['translation_freq'].replace(';', ',')}\n\n"
+            parts.append(f"Tibetan Term: {tibetan_term} Translation: {term_row['translation_freq'].replace(';', ',')}\n\n")
             
             # Add the standardization protocol
-            example += f"""Translation Standardization Protocol for {language}:
+            parts.append(f"""Translation Standardization Protocol for {language}:
 
 1. Context Compatibility Analysis: Evaluate each candidate translation by substituting it across all attested examples to ensure semantic congruence in every context.
 
@@ -197,13 +198,62 @@ Output:
 Tibetan Term: [Tibetan term]
 Selected standard translation: [Selected translation in {language}]
 Rationale: [Brief explanation of why this translation was selected based on the rules]
-Target audience: [Target audience in order of priority]"""
+Target audience: [Target audience in order of priority]""")
             
-            examples.append(example)
+            examples.append("".join(parts))
     
-    logger.info(f"✅ Generated {len(examples)} standardization examples")
+    logger.info("✅ Generated %s standardization examples", len(examples))
     return examples
 
+def _batch_with_retry(runnable, inputs, label, max_concurrency=10, attempts=2):
+    """
+    Run runnable over all inputs with up to max_concurrency calls in flight,
+    so one slow call never holds back the rest of a fixed-size batch.
+    
+    Inputs that fail are retried together after an exponential backoff with
+    jitter, so a rate-limited provider gets time to recover.
+    
+    Returns:
+        One result per input, in order; an input that failed on every
+        attempt has its last exception in place of a result
+    """
+    results = [None] * len(inputs)
+    pending = list(range(len(inputs)))
+    for attempt in range(attempts):
+        outputs = runnable.batch(
+            [inputs[i] for i in pending],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        failed = []
+        for i, output in zip(pending, outputs):
+            results[i] = output
+            if isinstance(output, Exception):
+                failed.append(i)
+        if not failed:
+            break
+        logger.error("❌ %s %s failed (attempt %s/%s): %s", len(failed), label, attempt + 1, attempts, results[failed[0]])
+        pending = failed
+        if attempt + 1 < attempts:
+            delay = min(30, 2 ** attempt + random.random())
+            logger.info("🔄 Retrying %s %s in %.1fs...", len(failed), label, delay)
+            time.sleep(delay)
+    return results
+
+def _standardized_term(result, language: str) -> Dict[str, str]:
+    """Convert a WordStandardization result to a dict, noting the target language in the rationale."""
+    result_dict = dict(result)
+    
+    # Log the standardized translation
+    logger.debug("Standardized term: %s → %s", result_dict.get('tibetan_term', ''), result_dict.get('standard_translation', ''))
+    
+    # Add language info if not present in the rationale
+    if language != 'English' and 'rationale' in result_dict:
+        if not f"in {language}" in result_dict['rationale']:
+            result_dict['rationale'] += f" This translation is optimal for {language} speakers."
+    
+    return result_dict
+
 def standardize_terminology(examples: List[str], language: str = 'English') -> List[Dict[str, str]]:
     """
     Standardize terminology by selecting the best translation for each term.
@@ -215,88 +265,60 @@ def standardize_terminology(examples: List[str], language: str = 'English') -> L
     Returns:
         List of dictionaries with standardized term data
     """
-    logger.info(f"🔄 Standardizing terminology for {language}...")
+    logger.info("🔄 Standardizing terminology for %s...", language)
     
     # Create LLM with structured output
-    word_standardizer = llm.with_structured_output(WordStandardization)
+    word_standardizer = structured_llm(WordStandardization)
+    
+    logger.info("🔄 Processing %s terms", len(examples))
+    results = _batch_with_retry(word_standardizer, examples, "terms", max_concurrency=30)
     
-    # Process in batches with progress reporting
     standardized_words = []
-    batch_size = 30
-    batches = [examples[i:i + batch_size] for i in range(0, len(examples), batch_size)]
+    for item_idx, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error("❌ Failed to process item %s: %s", item_idx + 1, result)
+            continue
+        standardized_words.append(_standardized_term(result, language))
     
-    for batch_idx, batch in enumerate(tqdm(batches, desc="Standardizing terms")):
-        try:
-            logger.info(f"🔄 Batch {batch_idx+1}/{len(batches)}: Processing {len(batch)} terms")
-            
-            # Process the batch
-            results = word_standardizer.batch(batch)
-            
-            # Process results and validate language
-            for result in results:
-                result_dict = dict(result)
-                
-                # Log the standardized translation
-                logger.debug(f"Standardized term: {result_dict.get('tibetan_term', '')} → {result_dict.get('standard_translation', '')}")
-                
-                # Add language info if not present in the rationale
-                if language != 'English' and 'rationale' in result_dict:
-                    if not f"in {language}" in result_dict['rationale']:
-                        result_dict['rationale'] += f" This translation is optimal for {language} speakers."
-                
-                standardized_words.append(result_dict)
-                
-            logger.debug(f"Successfully processed batch {batch_idx+1}")
-            
-        except Exception as e:
-            logger.error(f"❌ Error in batch {batch_idx+1}: {str(e)}")
-            logger.info(f"🔄 Retrying batch {batch_idx+1}...")
-            
-            try:
-                # Retry once
-                results = word_standardizer.batch(batch)
-                
-                # Process results and validate language
-                for result in results:
-                    result_dict = dict(result)
-                    
-                    # Log the standardized translation
-                    logger.debug(f"Standardized term on retry: {result_dict.get('tibetan_term', '')} → {result_dict.get('standard_translation', '')}")
-                    
-                    # Add language info if not present in the rationale
-                    if language != 'English' and 'rationale' in result_dict:
-                        if not f"in {language}" in result_dict['rationale']:
-                            result_dict['rationale'] += f" This translation is optimal for {language} speakers."
-                    
-                    standardized_words.append(result_dict)
-                
-                logger.debug(f"Successfully processed batch {batch_idx+1} on retry")
-            except Exception as retry_e:
-                logger.error(f"❌ Error on retry for batch {batch_idx+1}: {str(retry_e)}")
-                logger.info(f"⚠️ Processing items individually for batch {batch_idx+1}")
-                
-                # Process each item individually
-                for item_idx, item in enumerate(batch):
-                    try:
-                        result = word_standardizer.invoke(item)
-                        result_dict = dict(result)
-                        
-                        # Log the standardized translation
-                        logger.debug(f"Standardized term individually: {result_dict.get('tibetan_term', '')} → {result_dict.get('standard_translation', '')}")
-                        
-                        # Add language info if not present in the rationale
-                        if language != 'English' and 'rationale' in result_dict:
-                            if not f"in {language}" in result_dict['rationale']:
-                                result_dict['rationale'] += f" This translation is optimal for {language} speakers."
-                        
-                        standardized_words.append(result_dict)
-                        logger.debug(f"Successfully processed item {item_idx+1} individually")
-                    except Exception as item_e:
-                        logger.error(f"❌ Failed to process item {item_idx+1}: {str(item_e)}")
-    
-    logger.info(f"✅ Standardized {len(standardized_words)} terms")
+    logger.info("✅ Standardized %s terms", len(standardized_words))
     return standardized_words
 
+def _parse_translation_field(value):
+    """
+    Parse a translation field once into its stored shape.
+    
+    Translations may be stored as a list of iterations, as a JSON string
+    holding such a list or an object with a 'translation' key, or as plain
+    text. JSON strings are decoded; anything else is returned unchanged.
+    """
+    if isinstance(value, str) and (
+        (value.startswith('[') and value.endswith(']')) or
+        (value.startswith('{') and value.endswith('}'))
+    ):
+        try:
+            return serialization.loads(value)
+        except json.JSONDecodeError as e:
+            logger.debug("Failed to parse translation as JSON, using as plain string: %s", e)
+    return value
+
+def _final_translation(value) -> str:
+    """Return the final (most recent) translation held by a translation field."""
+    value = _parse_translation_field(value)
+    if isinstance(value, list):
+        return value[-1] if value else ""
+    if isinstance(value, dict) and 'translation' in value:
+        return value['translation']
+    return value if isinstance(value, str) else str(value)
+
+def _joined_translations(value) -> str:
+    """Return every translation held by a translation field, one per line."""
+    value = _parse_translation_field(value)
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    if isinstance(value, dict) and 'translation' in value:
+        return value['translation']
+    return value if isinstance(value, str) else str(value)
+
 def apply_standardized_terms(corpus: List[Dict[str, Any]], standardized_glossary: pd.DataFrame) -> List[Dict[str, Any]]:
     """
     Apply standardized terminology to all translations in the corpus.
@@ -311,7 +333,13 @@ def apply_standardized_terms(corpus: List[Dict[str, Any]], standardized_glossary
     logger.info("📝 Applying standardized terminology to translations...")
     
     # Create LLM with structured output
-    post_translator = llm.with_structured_output(PostTranslation)
+    post_translator = structured_llm(PostTranslation)
+    
+    # Map each Tibetan term to its standard translation once, keeping the first
+    # row for a term, instead of filtering the DataFrame per term per document
+    standard_translations = {}
+    for term, standard in zip(standardized_glossary['tibetan_term'], standardized_glossary['standard_translation']):
+        standard_translations.setdefault(term, standard)
     
     # Find documents with standardizable terms
     documents_to_process = []
@@ -321,11 +349,7 @@ def apply_standardized_terms(corpus: List[Dict[str, Any]], standardized_glossary
     for doc_idx, doc in enumerate(tqdm(corpus, desc="Analyzing documents")):
         # Extract Tibetan terms in document
         source_text = doc.get('source', '')
-        tibetan_terms = []
-        
-        for term in standardized_glossary['tibetan_term']:
-            if term in source_text:
-                tibetan_terms.append(term)
+        tibetan_terms = [term for term in standard_translations if term in source_text]
         
         # Only process documents with standardizable terms
         if tibetan_terms:
@@ -333,69 +357,22 @@ def apply_standardized_terms(corpus: List[Dict[str, Any]], standardized_glossary
             doc_indices.append(doc_idx)
             
             # Build glossary for this document
-            doc_glossary = []
-            for term in tibetan_terms:
-                term_row = standardized_glossary[standardized_glossary['tibetan_term'] == term].iloc[0]
-                doc_glossary.append({
-                    'tibetan_term': term,
-                    'standard_translation': term_row['standard_translation']
-                })
+            doc_glossary = [
+                {'tibetan_term': term, 'standard_translation': standard_translations[term]}
+                for term in tibetan_terms
+            ]
             
             # Format glossary as text
-            glossary_text = ""
-            for entry in doc_glossary:
-                for key, value in entry.items():
-                    glossary_text += f"{key}:-{value}\n"
-            
-            # Get translation - handle string, list, and JSON string cases
-            raw_translation = doc.get('translation', '')
-            
-            # If translation is a list, use the last translation (most recent/final version)
-            if isinstance(raw_translation, list) and raw_translation:
-                logger.debug(f"Translation is a list with {len(raw_translation)} options")
-                
-                # Use the last translation in the list
-                last_translation = raw_translation[-1] if raw_translation else ""
-                logger.debug(f"Using last translation (item {len(raw_translation)}) of length {len(last_translation)}")
-                
-                # Store all translations as plaintext_translation if not already present
-                if 'plaintext_translation' not in doc:
-                    doc['plaintext_translation'] = raw_translation
-                
-                raw_translation = last_translation
+            glossary_text = "".join(
+                f"{key}:-{value}\n" for entry in doc_glossary for key, value in entry.items()
+            )
             
-            # If translation is a string but might be a JSON string (containing a list or object)
-            elif isinstance(raw_translation, str) and (
-                (raw_translation.startswith('[') and raw_translation.endswith(']')) or
-                (raw_translation.startswith('{') and raw_translation.endswith('}'))
-            ):
-                logger.debug(f"Translation appears to be a JSON string, attempting to parse")
-                try:
-                    # Try to parse as JSON
-                    parsed_translation = json.loads(raw_translation)
-                    
-                    # Handle parsed result based on type
-                    if isinstance(parsed_translation, list) and parsed_translation:
-                        # If it's a list, use the last item
-                        if 'plaintext_translation' not in doc:
-                            doc['plaintext_translation'] = parsed_translation
-                        
-                        raw_translation = parsed_translation[-1]
-                        logger.debug(f"Successfully parsed JSON string to list, using last item")
-                    
-                    elif isinstance(parsed_translation, dict) and 'translation' in parsed_translation:
-                        # If it's an object with a translation field, use that
-                        raw_translation = parsed_translation['translation']
-                        logger.debug(f"Successfully parsed JSON string to object, using translation field")
-                    
-                    else:
-                        # Otherwise just convert to string
-                        raw_translation = str(parsed_translation)
-                        logger.debug(f"Parsed JSON but using string representation")
-                
-                except json.JSONDecodeError as e:
-                    # If parsing fails, keep as string
-                    logger.debug(f"Failed to parse as JSON, using as plain string: {str(e)}")
+            # Translation may be stored as a list of iterations or a JSON string;
+            # keep all iterations as plaintext_translation if not already present
+            translations = _parse_translation_field(doc.get('translation', ''))
+            if isinstance(translations, list) and translations and 'plaintext_translation' not in doc:
+                doc['plaintext_translation'] = translations
+            raw_translation = _final_translation(translations)
             
             # Create prompt for standardization
             prompt = f"""
@@ -424,46 +401,18 @@ STANDARDIZED TRANSLATION:
 """
             prompts.append(prompt)
     
-    logger.info(f"Found {len(documents_to_process)} documents with standardizable terms")
+    logger.info("Found %s documents with standardizable terms", len(documents_to_process))
     
-    # Process prompts in batches
+    # Process all prompts concurrently
     standardized_translations = [None] * len(prompts)
-    batch_size = 5
-    batches = [prompts[i:i + batch_size] for i in range(0, len(prompts), batch_size)]
-    batch_indices = [list(range(i, min(i + batch_size, len(prompts)))) for i in range(0, len(prompts), batch_size)]
+    results = _batch_with_retry(post_translator, prompts, "documents", max_concurrency=5)
     
-    for batch_idx, (batch, indices) in enumerate(zip(batches, batch_indices)):
-        try:
-            logger.info(f"🔄 Batch {batch_idx+1}/{len(batches)}: Processing {len(batch)} documents")
-            
-            # Process the batch
-            results = post_translator.batch(batch)
-            
-            # Store results
-            for i, result in zip(indices, results):
-                standardized_translations[i] = result.standardised_translation
-                
-        except Exception as e:
-            logger.error(f"❌ Error in batch {batch_idx+1}: {str(e)}")
-            logger.info(f"🔄 Retrying batch {batch_idx+1}...")
-            
-            try:
-                # Retry once
-                results = post_translator.batch(batch)
-                for i, result in zip(indices, results):
-                    standardized_translations[i] = result.standardised_translation
-            except Exception as retry_e:
-                logger.error(f"❌ Error on retry for batch {batch_idx+1}: {str(retry_e)}")
-                
-                # Process each item individually
-                for idx, (i, prompt) in enumerate(zip(indices, batch)):
-                    try:
-                        result = post_translator.invoke(prompt)
-                        standardized_translations[i] = result.standardised_translation
-                        logger.debug(f"Successfully processed item {idx+1} individually")
-                    except Exception as item_e:
-                        logger.error(f"❌ Failed to process item {idx+1}: {str(item_e)}")
-                        standardized_translations[i] = documents_to_process[i].get('translation', '')  # Fall back to original
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error("❌ Failed to process item %s: %s", i + 1, result)
+            standardized_translations[i] = documents_to_process[i].get('translation', '')  # Fall back to original
+        else:
+            standardized_translations[i] = result.standardised_translation
     
     # Update corpus with standardized translations
     updated_corpus = corpus.copy()
@@ -479,10 +428,10 @@ STANDARDIZED TRANSLATION:
             # Ensure required fields are present
             for field in ['source', 'combined_commentary']:
                 if field not in updated_corpus[doc_idx]:
-                    logger.warning(f"⚠️ Missing required field '{field}' in document {doc_idx+1}")
+                    logger.warning("⚠️ Missing required field '%s' in document %s", field, doc_idx + 1)
                     updated_corpus[doc_idx][field] = ""
     
-    logger.info(f"✅ Applied standardized terminology to {len(documents_to_process)} documents")
+    logger.info("✅ Applied standardized terminology to %s documents", len(documents_to_process))
     return updated_corpus
 
 def generate_word_by_word(corpus: List[Dict[str, Any]], language: str = 'English') -> List[Dict[str, Any]]:
@@ -499,49 +448,13 @@ def generate_word_by_word(corpus: List[Dict[str, Any]], language: str = 'English
     logger.info("🔤 Generating word-by-word mappings...")
     
     # Create LLM with structured output
-    word_by_word_translator = llm.with_structured_output(WordByWordTranslation)
+    word_by_word_translator = structured_llm(WordByWordTranslation)
     
     # Create prompts
     prompts = []
     for doc in tqdm(corpus, desc="Preparing word-by-word prompts"):
-        # Handle translation that might be a list or JSON string
-        translation = doc.get('translation', '')
-        
-        # If translation is a list, use the last item
-        if isinstance(translation, list) and translation:
-            # Use the last translation in the list (most recent/final version)
-            translation = translation[-1] if translation else ""
-            logger.debug(f"Using last translation (item {len(doc['translation'])}) from list for word-by-word mapping")
-        
-        # If translation is a JSON string, try to parse it
-        elif isinstance(translation, str) and (
-            (translation.startswith('[') and translation.endswith(']')) or
-            (translation.startswith('{') and translation.endswith('}'))
-        ):
-            logger.debug(f"Translation appears to be a JSON string, attempting to parse for word-by-word mapping")
-            try:
-                # Try to parse as JSON
-                parsed_translation = json.loads(translation)
-                
-                # Handle parsed result based on type
-                if isinstance(parsed_translation, list) and parsed_translation:
-                    # If it's a list, use the last item
-                    translation = parsed_translation[-1]
-                    logger.debug(f"Parsed JSON string to list, using last item for word-by-word mapping")
-                
-                elif isinstance(parsed_translation, dict) and 'translation' in parsed_translation:
-                    # If it's an object with a translation field, use that
-                    translation = parsed_translation['translation']
-                    logger.debug(f"Parsed JSON string to object, using translation field for word-by-word mapping")
-                
-                else:
-                    # Otherwise just convert to string
-                    translation = str(parsed_translation)
-                    logger.debug(f"Parsed JSON but using string representation for word-by-word mapping")
-            
-            except json.JSONDecodeError as e:
-                # If parsing fails, keep as string
-                logger.debug(f"Failed to parse as JSON, using as plain string: {str(e)}")
+        # Translation may be stored as a list of iterations or a JSON string
+        translation = _final_translation(doc.get('translation', ''))
         
         prompt = f"""
 Given source text and translation, create a word-by-word translation based on the standardized translation. Ensure the word-by-word translation accurately reflects the meaning of the standardized translation.
@@ -569,44 +482,17 @@ Example for {language}:
 """
         prompts.append(prompt)
     
-    # Process in batches
+    # Process all prompts concurrently
     word_by_word_translations = [None] * len(corpus)
-    batch_size = 20
-    batches = [prompts[i:i + batch_size] for i in range(0, len(prompts), batch_size)]
-    batch_indices = [list(range(i, min(i + batch_size, len(prompts)))) for i in range(0, len(prompts), batch_size)]
+    logger.info("🔄 Processing %s word-by-word mappings", len(prompts))
+    results = _batch_with_retry(word_by_word_translator, prompts, "word-by-word mappings", max_concurrency=20)
     
-    for batch_idx, (batch, indices) in enumerate(zip(batches, batch_indices)):
-        try:
-            logger.info(f"🔄 Batch {batch_idx+1}/{len(batches)}: Processing {len(batch)} word-by-word mappings")
-            
-            # Process the batch
-            results = word_by_word_translator.batch(batch)
-            
-            # Store results
-            for i, result in zip(indices, results):
-                word_by_word_translations[i] = result.word_by_word_translation
-                
-        except Exception as e:
-            logger.error(f"❌ Error in batch {batch_idx+1}: {str(e)}")
-            logger.info(f"🔄 Retrying batch {batch_idx+1}...")
-            
-            try:
-                # Retry once
-                results = word_by_word_translator.batch(batch)
-                for i, result in zip(indices, results):
-                    word_by_word_translations[i] = result.word_by_word_translation
-            except Exception as retry_e:
-                logger.error(f"❌ Error on retry for batch {batch_idx+1}: {str(retry_e)}")
-                
-                # Process each item individually
-                for idx, (i, prompt) in enumerate(zip(indices, batch)):
-                    try:
-                        result = word_by_word_translator.invoke(prompt)
-                        word_by_word_translations[i] = result.word_by_word_translation
-                        logger.debug(f"Successfully processed item {idx+1} individually")
-                    except Exception as item_e:
-                        logger.error(f"❌ Failed to process item {idx+1}: {str(item_e)}")
-                        word_by_word_translations[i] = ""  # Fallback to empty string
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error("❌ Failed to process item %s: %s", i + 1, result)
+            word_by_word_translations[i] = ""  # Fallback to empty string
+        else:
+            word_by_word_translations[i] = result.word_by_word_translation
     
     # Update corpus with word-by-word translations
     updated_corpus = corpus.copy()
@@ -614,7 +500,7 @@ Example for {language}:
         if wbw:
             updated_corpus[i]['word_by_word_translation'] = wbw
     
-    logger.info(f"✅ Generated {sum(1 for wbw in word_by_word_translations if wbw)} word-by-word mappings")
+    logger.info("✅ Generated %s word-by-word mappings", sum(1 for wbw in word_by_word_translations if wbw))
     return updated_corpus
 
 def post_process_corpus(corpus: List[Dict[str, Any]], 
@@ -641,13 +527,13 @@ def post_process_corpus(corpus: List[Dict[str, Any]],
         for doc in corpus:
             if 'language' in doc and doc['language']:
                 language = doc['language']
-                logger.info(f"🌐 Auto-detected language from corpus: {language}")
+                logger.info("🌐 Auto-detected language from corpus: %s", language)
                 break
         
         # Default to English if not found
         if language is None:
             language = 'English'
-            logger.info(f"🌐 No language found in corpus, defaulting to: {language}")
+            logger.info("🌐 No language found in corpus, defaulting to: %s", language)
     
     # Extract glossaries from all documents
     logger.info("📊 Extracting glossaries from corpus...")
@@ -656,33 +542,33 @@ def post_process_corpus(corpus: List[Dict[str, Any]],
         if 'glossary' in doc and doc['glossary']:
             all_glossaries.append(doc['glossary'])
     
-    logger.info(f"📊 Extracted glossaries from {len(all_glossaries)} documents")
+    logger.info("📊 Extracted glossaries from %s documents", len(all_glossaries))
     
     # Analyze term frequencies
     term_freq_df = analyze_term_frequencies(all_glossaries)
     
     # Generate standardization examples with target language
-    logger.info(f"🌐 Generating standardization examples for {language}")
+    logger.info("🌐 Generating standardization examples for %s", language)
     examples = generate_standardization_examples(term_freq_df, corpus, language=language)
     
     # Standardize terminology with target language
-    logger.info(f"🌐 Standardizing terminology in {language}")
+    logger.info("🌐 Standardizing terminology in %s", language)
     standardized_terms = standardize_terminology(examples, language=language)
     
     # Convert to DataFrame and save
     standardized_df = pd.DataFrame(standardized_terms)
     standardized_df.to_csv(glossary_file, index=False)
-    logger.info(f"💾 Saved standardized glossary to {glossary_file}")
+    logger.info("💾 Saved standardized glossary to %s", glossary_file)
     
     # Apply standardized terms to corpus
     updated_corpus = apply_standardized_terms(corpus, standardized_df)
     
     # Generate word-by-word translations
-    logger.info(f"🌐 Generating word-by-word translations in {language}")
+    logger.info("🌐 Generating word-by-word translations in %s", language)
     final_corpus = generate_word_by_word(updated_corpus, language=language)
     
     # Save final corpus
-    logger.info(f"💾 Saving final processed corpus to {output_file}...")
+    logger.info("💾 Saving final processed corpus to %s...", output_file)
     
     # Determine format based on file extension
     is_jsonl = output_file.endswith('.jsonl')
@@ -700,107 +586,36 @@ def post_process_corpus(corpus: List[Dict[str, Any]],
             # Get field value, handling special cases
             field_value = doc.get(field, "")
             
-            # Handle translation lists - convert to last translation if needed
+            # Reduce translation fields to plain strings
             if field == 'translation':
-                # Handle list case
-                if isinstance(field_value, list) and field_value:
-                    field_value = field_value[-1] if field_value else ""
-                    logger.debug(f"Converting translation list to single string (using last item) for output")
-                
-                # Handle JSON string case
-                elif isinstance(field_value, str) and (
-                    (field_value.startswith('[') and field_value.endswith(']')) or
-                    (field_value.startswith('{') and field_value.endswith('}'))
-                ):
-                    logger.debug(f"Output translation appears to be a JSON string, attempting to parse")
-                    try:
-                        # Try to parse as JSON
-                        parsed = json.loads(field_value)
-                        
-                        # Handle parsed result based on type
-                        if isinstance(parsed, list) and parsed:
-                            # Use last item in list
-                            field_value = parsed[-1]
-                            logger.debug(f"Parsed output translation to list, using last item")
-                        
-                        elif isinstance(parsed, dict) and 'translation' in parsed:
-                            # Use translation field from object
-                            field_value = parsed['translation']
-                            logger.debug(f"Parsed output translation to object, using translation field")
-                        
-                        else:
-                            # Otherwise use string representation
-                            field_value = str(parsed)
-                            logger.debug(f"Parsed JSON but using string representation for output")
-                    
-                    except json.JSONDecodeError:
-                        # Keep as is if not valid JSON
-                        pass
-            
-            # For plaintext_translation, make sure it's a string (could be a list or JSON string)
-            if field == 'plaintext_translation':
-                # Handle list case
-                if isinstance(field_value, list) and field_value:
-                    # Join all translations with newlines
-                    field_value = "\n".join(field_value)
-                    logger.debug(f"Converting plaintext_translation list to concatenated string")
-                
-                # Handle JSON string case
-                elif isinstance(field_value, str) and (
-                    (field_value.startswith('[') and field_value.endswith(']')) or
-                    (field_value.startswith('{') and field_value.endswith('}'))
-                ):
-                    logger.debug(f"Plaintext translation appears to be a JSON string, attempting to parse")
-                    try:
-                        # Try to parse as JSON
-                        parsed = json.loads(field_value)
-                        
-                        # Handle parsed result based on type
-                        if isinstance(parsed, list) and parsed:
-                            # Join all list items with newlines
-                            field_value = "\n".join([str(item) for item in parsed])
-                            logger.debug(f"Parsed plaintext_translation to list and joined items")
-                        
-                        elif isinstance(parsed, dict) and 'translation' in parsed:
-                            # Use translation field from object
-                            field_value = parsed['translation']
-                            logger.debug(f"Parsed plaintext_translation to object, using translation field")
-                        
-                        else:
-                            # Otherwise use string representation
-                            field_value = str(parsed)
-                            logger.debug(f"Parsed JSON but using string representation for plaintext_translation")
-                    
-                    except json.JSONDecodeError:
-                        # Keep as is if not valid JSON
-                        pass
+                field_value = _final_translation(field_value)
+            elif field == 'plaintext_translation':
+                field_value = _joined_translations(field_value)
             
             # Set the field value
             output_doc[field] = field_value
             
             # If a required field is missing, log a warning
             if not output_doc[field] and field != 'word_by_word_translation':  # word_by_word can be empty
-                logger.warning(f"⚠️ Missing required field '{field}' in document")
+                logger.warning("⚠️ Missing required field '%s' in document", field)
         
         final_output.append(output_doc)
     
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with open(output_file, 'wb') as f:
         if is_jsonl:
-            # Save as JSONL (one JSON object per line)
-            for doc in final_output:
-                json.dump(doc, f, ensure_ascii=False)
-                f.write('\n')
-            logger.debug(f"Saved {len(final_output)} documents in JSONL format")
+            # Save as JSONL (one JSON object per line), encoding one record at
+            # a time so the whole output is never held in memory as bytes
+            f.writelines(serialization.dumps_record(doc) for doc in final_output)
         else:
-            # Save as regular JSON
-            json.dump(final_output, f, ensure_ascii=False, indent=4)
-            logger.debug(f"Saved {len(final_output)} documents in JSON format")
+            # Save as regular JSON, encoded straight to bytes and written in one call
+            f.write(serialization.dumps_document(final_output))
+    logger.debug("Saved %s documents in %s format", len(final_output), 'JSONL' if is_jsonl else 'JSON')
     
     logger.info("✅ Post-translation processing complete!")
     logger.info("📊 Results summary:")
-    logger.info(f"  - Standardized {len(standardized_terms)} terms")
-    logger.info(f"  - Updated {len([doc for doc in final_corpus if doc.get('translation')])} translations")
-    logger.info(f"  - Generated {len([doc for doc in final_corpus if doc.get('word_by_word_translation')])} word-by-word mappings")
-    logger.info(f"  - Output saved to: {output_file}")
+    logger.info("  - Standardized %s terms", len(standardized_terms))
+    logger.info("  - Updated %s translations", sum(1 for doc in final_corpus if doc.get('translation')))
+    logger.info("  - Generated %s word-by-word mappings", sum(1 for doc in final_corpus if doc.get('word_by_word_translation')))
+    logger.info("  - Output saved to: %s", output_file)
     
     return final_corpus
\ No newline at end of file
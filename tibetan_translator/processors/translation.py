@@ -1,29 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
-from tibetan_translator.models import State, Translation_extractor
+from tibetan_translator.completion_cache import cached_invoke
+from tibetan_translator.models import State, Translation_extractor, DualTranslation, SelfRevisedTranslation
 from tibetan_translator.prompts import (
     get_translation_evaluation_prompt,
     get_translation_improvement_prompt,
     get_initial_translation_prompt,
+    get_translate_and_revise_prompt,
     get_translation_prompt
 )
 from tibetan_translator.utils import (
     llm, 
     llm_thinking, 
     get_translation_extraction_prompt, 
+    get_dual_translation_extraction_prompt,
     get_plain_translation_prompt, 
-    get_enhanced_translation_prompt
+    get_enhanced_translation_prompt,
+    log_cache_usage,
+    cached_structured_invoke,
+    extract_text
 )
 from tibetan_translator.config import MAX_TRANSLATION_ITERATIONS
 
 
+# Runs the plain-language translation alongside the thinking translation
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="translation")
+
+
+def _usage_logged_text(label: str):
+    """Return an extract function for cached_invoke that also logs prompt-cache usage."""
+    def extract(response):
+        log_cache_usage(response, label)
+        return extract_text(response)
+    return extract
+
+
+def _extract_translation(source: str, content: str, language: str):
+    """Extract the final translation text from a model response."""
+    return cached_structured_invoke(
+        Translation_extractor,
+        get_translation_extraction_prompt(source, content, language=language),
+        namespace="translation_extraction_v1",
+    )
+
+
+def _plain_translation(source: str, language: str) -> str:
+    """Translate source into plain language and return the response text."""
+    plain_translation_prompt = get_plain_translation_prompt(source, language=language)
+    
+    # Use standard LLM with few-shot prompting for plain translation in target language
+    plain_translation_content = cached_invoke(
+        llm, plain_translation_prompt, namespace="plain_translation_v1",
+        extract=_usage_logged_text("plain_translation"),
+    )
+    return plain_translation_content
+
+
+def _is_source_focused(state: State) -> bool:
+    """True when the verse has no commentaries and is translated from a source analysis."""
+    return not any(state.get(k) for k in ("commentary1", "commentary2", "commentary3"))
+
+
 def translation_generator(state: State):
     """Generate improved translation based on commentary and feedback."""
-    previous_feedback = "\n".join(state["feedback_history"]) if state["feedback_history"] else "No prior feedback."
     current_iteration = state.get("itteration", 0)
+    target_language = state.get('language', 'English')
 
     if state.get("feedback_history"):
-        latest_feedback = state["feedback_history"][-1] if state["feedback_history"] else "No feedback yet."
-        target_language = state.get('language', 'English')
+        latest_feedback = state["feedback_history"][-1]
         
         prompt = get_translation_improvement_prompt(
             state['sanskrit'], state['source'], state['combined_commentary'], 
@@ -31,26 +75,21 @@ def translation_generator(state: State):
             language=target_language
         )
         # Use standard llm for subsequent iterations
-        msg = llm.invoke(prompt)
-        translation = llm.with_structured_output(Translation_extractor).invoke(
-            get_translation_extraction_prompt(state['source'], msg.content, language=target_language)
-        )
+        improved_content = cached_invoke(llm, prompt, namespace="translation_improvement_v1", extract=extract_text)
+        translation = _extract_translation(state['source'], improved_content, target_language)
         return {
             "translation": state["translation"] + [translation.extracted_translation],
             "itteration": current_iteration + 1
         }
     else:
-        # Check if we're using source analysis mode (no commentaries)
-        is_source_focused = not state.get('commentary1') and not state.get('commentary2') and not state.get('commentary3')
-        
         # Select the appropriate translation prompt based on mode
-        if is_source_focused:
+        if _is_source_focused(state):
             # Use enhanced translation prompt for source-focused translation
             prompt = get_enhanced_translation_prompt(
                 state['sanskrit'], 
                 state['source'], 
                 state['combined_commentary'],  # This now contains source analysis
-                language=state.get('language', 'English')
+                language=target_language
             )
         else:
             # Use standard commentary-based translation prompt
@@ -58,67 +97,83 @@ def translation_generator(state: State):
                 state['sanskrit'], 
                 state['source'], 
                 state['combined_commentary'], 
-                language=state.get('language', 'English')
+                language=target_language
             )
         
-        # Use thinking LLM for primary translation
-        thinking_response = llm_thinking.invoke(prompt)
+        # The plain language version only depends on the source, so it is
+        # translated while the thinking translation runs
+        plain_translation_future = _executor.submit(_plain_translation, state['source'], target_language)
         
-        # Extract content and thinking from thinking response
-        translation_content = ""
-        thinking_content = ""
-        
-        # Handle llm_thinking response structure which is typically:
-        # [{'signature': '...', 'thinking': '...', 'type': 'thinking'}, 
-        #  {'text': '...', 'type': 'text'}]
-        if isinstance(thinking_response, list):
-            # Just extract the text portion (second dictionary with text key)
-            for chunk in thinking_response:
-                if isinstance(chunk, dict) and chunk.get('type') == 'text':
-                    translation_content = chunk.get('text', '')
-                elif isinstance(chunk, dict) and chunk.get('type') == 'thinking':
-                    thinking_content = chunk.get('thinking', '')
-        elif hasattr(thinking_response, 'content'):
-            translation_content = thinking_response.content[1]['text']
-        else:
-            translation_content = str(thinking_response)
-            
-        # Now create and process plain language version separately using the few-shot prompt with correct language
-        target_language = state.get('language', 'English')
-        plain_translation_prompt = get_plain_translation_prompt(state['source'], language=target_language)
-        
-        # Use standard LLM with few-shot prompting for plain translation in target language
-        plain_translation_response = llm.invoke(plain_translation_prompt)
-        
-        # Extract plain translation content
-        plain_translation_content = plain_translation_response.content if hasattr(plain_translation_response, 'content') else str(plain_translation_response)
-            
-        # Get target language from state
-        target_language = state.get('language', 'English')
-        
-        # Use few-shot prompting with regular LLM for structured output extraction
-        translation = llm.with_structured_output(Translation_extractor).invoke(
-            get_translation_extraction_prompt(state['source'], translation_content, language=target_language)
+        # Use thinking LLM for primary translation
+        # and keep only the answer text; the thinking blocks are not kept
+        translation_content = cached_invoke(
+            llm_thinking, prompt, namespace="initial_translation_v1",
+            extract=_usage_logged_text("initial_translation"),
         )
         
-        # Also extract plain translation using few-shot prompting
-        plain_translation = llm.with_structured_output(Translation_extractor).invoke(
-            get_translation_extraction_prompt(state['source'], plain_translation_content, language=target_language)
+        # Extract both translations with a single few-shot structured output call
+        plain_translation_content = plain_translation_future.result()
+        extracted = cached_structured_invoke(
+            DualTranslation,
+            get_dual_translation_extraction_prompt(
+                state['source'], translation_content, plain_translation_content, language=target_language
+            ),
+            namespace="dual_translation_extraction_v1",
         )
         
-        # Create feedback entry with both translation and thinking parts
+        # Create feedback entry with the initial translation
         feedback_entry = f"Iteration {current_iteration} - Initial Translation:\n{translation_content}\n"
-        if thinking_content:
-            feedback_entry += f"\nTHINKING PROCESS:\n{thinking_content}\n"
             
         return {
-            "translation": [translation.extracted_translation],
-            "plaintext_translation": plain_translation.extracted_translation,
+            "translation": [extracted.extracted_translation],
+            "plaintext_translation": extracted.extracted_plain_translation,
             "feedback_history": [feedback_entry],
-            "iteration": 1
+            "itteration": current_iteration + 1
         }
 
 
+def translate_with_self_revision(state: State):
+    """Draft, self-critique and revise the first translation in a single call.
+    
+    Used in place of the first translation_generator pass when
+    SELF_REVISION_ENABLED is set. The evaluator still checks the result, and
+    route_translation sends anything it rejects back to translation_generator.
+    Verses without commentaries keep the enhanced source-focused prompt, so
+    they are handed to translation_generator directly.
+    """
+    if _is_source_focused(state):
+        return translation_generator(state)
+    
+    current_iteration = state.get("itteration", 0)
+    target_language = state.get('language', 'English')
+    
+    # The plain language version is translated and extracted in the meantime
+    plain_translation_future = _executor.submit(_plain_translation, state['source'], target_language)
+    
+    revision = cached_structured_invoke(
+        SelfRevisedTranslation,
+        get_translate_and_revise_prompt(
+            state['sanskrit'], state['source'], state['combined_commentary'], language=target_language
+        ),
+        namespace="self_revision_v1",
+    )
+    plain_translation = _extract_translation(state['source'], plain_translation_future.result(), target_language)
+    
+    # Keep the draft and critique so the evaluator and later iterations can see them
+    feedback_entry = (
+        f"Iteration {current_iteration} - Self-Revised Translation (self-assessed grade: {revision.grade})\n"
+        f"Draft:\n{revision.draft}\n"
+        f"Critique:\n{revision.critique}\n"
+    )
+    
+    return {
+        "translation": [revision.final_translation],
+        "plaintext_translation": plain_translation.extracted_translation,
+        "feedback_history": [feedback_entry],
+        "itteration": current_iteration + 1
+    }
+
+
 def route_translation(state: State):
     """Route based on both translation quality and formatting."""
     # Only proceed if both content is good AND formatting is correct
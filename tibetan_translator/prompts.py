@@ -1,9 +1,11 @@
 
+import functools
+import re
 from tibetan_translator.models import KeyPoint, State
 from typing import List
 from tibetan_translator.models import CommentaryVerification, Translation_extractor
 import json
-from tibetan_translator.utils import llm
+from tibetan_translator.utils import llm, prefix_cached_prompt
 
 def get_translation_prompt(source, example):
     # This is kept for backward compatibility
@@ -31,15 +33,9 @@ For each key point, provide:
 
 Structure the output as a list of points, each containing these four elements."""
 
-def get_verification_prompt(translation, combined_commentary, language="English"):
-    """Get prompt to verify translation against commentary."""
-    return f"""Verify this translation against the commentary:
-
-Translation:
-{translation}
-
-Commentary (Including Analysis):
-{combined_commentary}
+@functools.lru_cache(maxsize=16)
+def _verification_instructions(language):
+    return f"""Verify the translation below against the commentary.
 
 Verify:
     matches_commentary: bool = Field(
@@ -57,14 +53,24 @@ Verify:
 
 Important: Your verification MUST be in {language}. Provide all feedback, descriptions, and analyses in {language}.
 
-Provide structured verification results."""
+Provide structured verification results.
 
-def get_commentary_translation_prompt(sanskrit, source, commentary, language="English"):
-    return f"""As an expert in Tibetan Commentary translation\\\, translate this commentary into {language}:
-    Sanskrit text:
-{sanskrit}
-Source Text: {source}
-Commentary to translate: {commentary}
+"""
+
+def get_verification_prompt(translation, combined_commentary, language="English"):
+    """Get prompt to verify translation against commentary."""
+    # Instructions and commentary are fixed for a verse; only the translation
+    # changes between iterations, so it goes last, after the cache breakpoint.
+    prefix = _verification_instructions(language) + f"""Commentary (Including Analysis):
+{combined_commentary}
+
+"""
+    return prefix_cached_prompt(prefix, f"""Translation:
+{translation}""")
+
+@functools.lru_cache(maxsize=16)
+def _commentary_translation_instructions(language):
+    return f"""As an expert in Tibetan Commentary translation\\\, translate the commentary given below into {language}.
 
 Focus on:
 - Accurate translation of technical terms into {language}
@@ -74,7 +80,17 @@ Focus on:
 - Correct translation of formal language
 - Ensure all terminology is translated into {language}
 
-Provide only the translated commentary in {language}."""
+Provide only the translated commentary in {language}.
+
+"""
+
+def get_commentary_translation_prompt(sanskrit, source, commentary, language="English"):
+    # Instructions come first and depend only on the language, so the prompt
+    # prefix is shared by every verse; the per-verse texts follow at the end.
+    return _commentary_translation_instructions(language) + f"""Sanskrit text:
+{sanskrit}
+Source Text: {source}
+Commentary to translate: {commentary}"""
 
 # This prompt is deprecated - use get_combined_commentary_prompt from utils.py instead
 # def get_combined_commentary_prompt(source, commentaries, language="English"):
@@ -89,12 +105,9 @@ Provide only the translated commentary in {language}."""
 # """
 
 
-def get_language_check_prompt(translation, language="English"):
-    """Generate a prompt to verify if a translation is in the target language."""
-    return f"""Verify if this text is actually written in {language}:
-
-Translation to check:
-{translation}
+@functools.lru_cache(maxsize=16)
+def _language_check_instructions(language):
+    return f"""Verify if the text below is actually written in {language}.
 
 CRITICAL TASK:
 1. First, determine if this text is primarily written in {language}
@@ -106,27 +119,21 @@ Your response must provide:
 2. language_issues: If not in {language}, describe what language it appears to be in and any specific issues
 
 IMPORTANT: This check is only about the language used, not about translation quality or correctness.
-"""
-
-def get_translation_evaluation_prompt(source, translation, combined_commentary, verification, previous_feedback, language="English"):
-    """Generate a prompt for evaluating a translation against commentary with language-specific feedback."""
-    # Count the number of lines in the source
-    source_lines = len([line for line in source.split('\n') if line.strip()])
-    
-    return f"""Evaluate this translation comprehensively for content accuracy, structural formatting, AND linguistic fluency in {language}:
 
-Source Text: {source}
-Target Language: {language}
-Translation: {translation}
+"""
 
-Commentary (Including Analysis):
-{combined_commentary}
+def get_language_check_prompt(translation, language="English"):
+    """Generate a prompt to verify if a translation is in the target language."""
+    return _language_check_instructions(language) + f"""Translation to check:
+{translation}
+"""
 
-Previous Feedback:
-{previous_feedback}
+# Matches once per line that has any non-whitespace character
+_NON_BLANK_LINE = re.compile(r'^[^\S\n]*\S', re.MULTILINE)
 
-Verification Results:
-{verification}
+@functools.lru_cache(maxsize=16)
+def _evaluation_instructions(language):
+    return f"""Evaluate the translation below comprehensively for content accuracy, structural formatting, AND linguistic fluency in {language}.
 
 CRITICAL VERIFICATION STEPS:
 1. FIRST, verify the translation is actually written in {language}, not in another language
@@ -134,7 +141,7 @@ CRITICAL VERIFICATION STEPS:
 3. Only if confirmed to be in {language}, proceed with full evaluation
 
 CRITICAL STRUCTURAL REQUIREMENTS:
-- Source has approximately {source_lines} lines/segments - translation MUST have similar structure
+- Translation MUST have a similar number of lines/segments to the source (see Source Lines below)
 - If source is in verse form, translation MUST be in verse form
 - Paragraph breaks and line breaks MUST match the source text structure
 - Sentence boundaries should respect the source text
@@ -172,25 +179,38 @@ For your response, provide:
 
 IMPORTANT: Your evaluation MUST be in {language}. Provide all feedback in {language} with specific suggestions for how to improve the translation's fluency and naturalness in {language}.
 
-Formatting issues, incorrect structure, and unnatural language are ALL CRITICAL problems that must be fixed for a translation to be acceptable."""
-def get_translation_improvement_prompt(sanskrit, source, combined_commentary, latest_feedback, current_translation, language="English"):
-    """Generate a prompt for improving a translation based on feedback."""
-    return f"""Create an improved {language} translation that addresses the previous feedback:
+Formatting issues, incorrect structure, and unnatural language are ALL CRITICAL problems that must be fixed for a translation to be acceptable.
 
-Sanskrit text:
-{sanskrit}
+Target Language: {language}
 
-Source Text:
-{source}
+"""
 
-Commentary Analysis:
+def get_translation_evaluation_prompt(source, translation, combined_commentary, verification, previous_feedback, language="English"):
+    """Generate a prompt for evaluating a translation against commentary with language-specific feedback."""
+    # Count the non-blank lines in the source
+    source_lines = sum(1 for _ in _NON_BLANK_LINE.finditer(source))
+    
+    # Per-verse inputs follow the cached instructions, with the parts that
+    # change between iterations (translation, verification, feedback) after
+    # the cache breakpoint.
+    prefix = _evaluation_instructions(language) + f"""Source Text: {source}
+Source Lines: {source_lines}
+
+Commentary (Including Analysis):
 {combined_commentary}
 
-Latest Feedback to Address:
-{latest_feedback}
+"""
+    return prefix_cached_prompt(prefix, f"""Translation: {translation}
 
-Current Translation:
-{current_translation}
+Verification Results:
+{verification}
+
+Previous Feedback:
+{previous_feedback}""")
+
+@functools.lru_cache(maxsize=16)
+def _improvement_instructions(language):
+    return f"""Create an improved {language} translation that addresses the latest feedback given below.
 
 LINGUISTIC REQUIREMENTS FOR {language.upper()}:
 - Your translation MUST be in fluent, natural {language}
@@ -211,21 +231,32 @@ IMPROVEMENT REQUIREMENTS:
 
 IMPORTANT: Generate ONLY the improved translation in fluent, natural {language}. Do not include explanations or notes.
 
-Your translation should preserve the original meaning but express it in a way that sounds completely natural to native {language} speakers."""
-def get_initial_translation_prompt(sanskrit, source, combined_commentary, language="English"):
-    """Generate a prompt for the initial translation of a Tibetan Buddhist text."""
-    return f"""
-Translate this Tibetan Buddhist text into natural, fluent {language}:
+Your translation should preserve the original meaning but express it in a way that sounds completely natural to native {language} speakers.
+
+"""
 
-Sanskrit text:
+def get_translation_improvement_prompt(sanskrit, source, combined_commentary, latest_feedback, current_translation, language="English"):
+    """Generate a prompt for improving a translation based on feedback."""
+    prefix = _improvement_instructions(language) + f"""Sanskrit text:
 {sanskrit}
 
 Source Text:
 {source}
 
-Context (Including Analysis):
+Commentary Analysis:
 {combined_commentary}
 
+"""
+    return prefix_cached_prompt(prefix, f"""Current Translation:
+{current_translation}
+
+Latest Feedback to Address:
+{latest_feedback}""")
+
+@functools.lru_cache(maxsize=16)
+def _initial_translation_instructions(language):
+    return f"""Translate the Tibetan Buddhist text given below into natural, fluent {language}.
+
 LANGUAGE-SPECIFIC REQUIREMENTS FOR {language.upper()}:
 - Your translation MUST be in fluent, natural {language} as spoken by native speakers
 - Use appropriate {language} grammar, syntax, and idiomatic expressions
@@ -246,19 +277,46 @@ Translation guidance:
 
 YOUR GOAL: Create a translation that sounds as if it were originally written in {language} by a native speaker with expertise in Buddhism.
 
-Generate the translation in a clear and structured format matching the source text structure."""
-def get_formatting_feedback_prompt(source, translation, previous_feedback, language="English"):
-    """Generate a prompt to evaluate and improve translation formatting."""
-    return f"""Analyze the formatting of this translation:
+Generate the translation in a clear and structured format matching the source text structure.
+
+"""
+
+def get_initial_translation_prompt(sanskrit, source, combined_commentary, language="English"):
+    """Generate a prompt for the initial translation of a Tibetan Buddhist text."""
+    return prefix_cached_prompt(_initial_translation_instructions(language), f"""Sanskrit text:
+{sanskrit}
 
 Source Text:
 {source}
 
-Translation:
-{translation}
+Context (Including Analysis):
+{combined_commentary}""")
 
-Previous Feedback:
-{previous_feedback}
+@functools.lru_cache(maxsize=16)
+def _self_revision_instructions(language):
+    return _initial_translation_instructions(language) + f"""Work in three steps and return each of them:
+1. draft: Translate the text following all of the requirements above
+2. critique: Critically review the draft against the source text and the context. Check that every concept from the commentary analysis is conveyed accurately, that the {language} is fluent and idiomatic, that Buddhist terminology is consistent, and that the line structure matches the source text
+3. final_translation: Revise the draft to address every point of the critique. Generate ONLY the translation in {language}, with no explanations or notes
+
+Finally grade the final translation as bad, okay, good or great. Only use great if the critique found nothing left to improve.
+
+"""
+
+def get_translate_and_revise_prompt(sanskrit, source, combined_commentary, language="English"):
+    """Generate a prompt that drafts, critiques and revises a translation in one call."""
+    return prefix_cached_prompt(_self_revision_instructions(language), f"""Sanskrit text:
+{sanskrit}
+
+Source Text:
+{source}
+
+Context (Including Analysis):
+{combined_commentary}""")
+
+@functools.lru_cache(maxsize=16)
+def _formatting_instructions(language):
+    return f"""Analyze the formatting of the translation below.
 
 Notes for evaluation:
 1. Your task is to evaluate the format, not the translation quality.
@@ -266,10 +324,24 @@ Notes for evaluation:
 3. Provide specific formatting guidance based on previous feedback.
 4. Ensure the format matches the source text.
 
-Provide specific formatting feedback."""
-def get_glossary_extraction_prompt(source, combined_commentary, final_translation, language="English", commentary_source="traditional"):
-    """Generate a prompt for extracting glossary terms from a translation."""
-    
+Provide specific formatting feedback.
+
+"""
+
+def get_formatting_feedback_prompt(source, translation, previous_feedback, language="English"):
+    """Generate a prompt to evaluate and improve translation formatting."""
+    prefix = _formatting_instructions(language) + f"""Source Text:
+{source}
+
+"""
+    return prefix_cached_prompt(prefix, f"""Translation:
+{translation}
+
+Previous Feedback:
+{previous_feedback}""")
+
+@functools.lru_cache(maxsize=32)
+def _glossary_extraction_instructions(language, commentary_source):
     # Customize commentary reference instructions based on source
     if commentary_source == "source_analysis":
         commentary_reference_instr = f"Commentary reference (IMPORTANT: Since this translation was based on direct source analysis rather than traditional commentaries, indicate this by starting with 'From source analysis:'(in {language} !!) followed by relevant linguistic or structural insights in {language})"
@@ -277,16 +349,7 @@ def get_glossary_extraction_prompt(source, combined_commentary, final_translatio
         commentary_reference_instr = f"Commentary reference (IMPORTANT: This MUST be written in {language}, referencing traditional commentary explanations)"
     
     return f"""
-Extract a comprehensive glossary from the final {language} translation only:
-
-Source Text:
-{source}
-
-{"Source Analysis:" if commentary_source == "source_analysis" else "Combined Commentary:"}
-{combined_commentary}
-
-Final Translation:
-{final_translation}
+Extract a comprehensive glossary from the final {language} translation only. The source text, {"source analysis" if commentary_source == "source_analysis" else "combined commentary"} and final translation are given at the end.
 
 For each technical term, provide:
 1. Original Tibetan term in the Source Text
@@ -343,4 +406,17 @@ IMPORTANT:
 2. The JSON must be valid and properly formatted
 3. All field contents in {language} (except the tibetan_term)
 4. Even for Chinese, Japanese, Korean and other non-Latin languages, preserve the JSON structure exactly as shown
-5. Do not add any text before or after the JSON array"""
\ No newline at end of file
+5. Do not add any text before or after the JSON array
+
+"""
+
+def get_glossary_extraction_prompt(source, combined_commentary, final_translation, language="English", commentary_source="traditional"):
+    """Generate a prompt for extracting glossary terms from a translation."""
+    return _glossary_extraction_instructions(language, commentary_source) + f"""Source Text:
+{source}
+
+{"Source Analysis:" if commentary_source == "source_analysis" else "Combined Commentary:"}
+{combined_commentary}
+
+Final Translation:
+{final_translation}"""
@@ -0,0 +1,42 @@
+# JSON helpers that use orjson when it is installed and fall back to the stdlib json module
+
+
+def _default(obj):
+    """Serialize pydantic models by their fields and anything else by str()."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+
+try:
+    import orjson
+
+    def dumps(obj):
+        """Serialize obj to compact, key-sorted UTF-8 JSON bytes."""
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+
+    def dumps_record(obj):
+        """Serialize obj to one UTF-8 JSON line (with trailing newline), keeping key order."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE, default=_default)
+
+    def dumps_document(obj):
+        """Serialize obj to indented UTF-8 JSON bytes for files meant to be read by people."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2, default=_default)
+
+    loads = orjson.loads
+except ImportError:
+    import json
+
+    def dumps(obj):
+        """Serialize obj to compact, key-sorted UTF-8 JSON bytes."""
+        return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+    def dumps_record(obj):
+        """Serialize obj to one UTF-8 JSON line (with trailing newline), keeping key order."""
+        return (json.dumps(obj, ensure_ascii=False, default=_default) + "\n").encode("utf-8")
+
+    def dumps_document(obj):
+        """Serialize obj to indented UTF-8 JSON bytes for files meant to be read by people."""
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=_default).encode("utf-8")
+
+    loads = json.loads
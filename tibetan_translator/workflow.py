@@ -1,9 +1,10 @@
 from langgraph.graph import StateGraph, START, END
 from tibetan_translator.models import State
 from tibetan_translator.processors.commentary import (
-    commentary_translator_1, commentary_translator_2, commentary_translator_3, aggregator
+    commentary_translators, aggregator
 )
-from tibetan_translator.processors.translation import translation_generator, route_translation
+from tibetan_translator.config import SELF_REVISION_ENABLED
+from tibetan_translator.processors.translation import translation_generator, translate_with_self_revision, route_translation
 from tibetan_translator.processors.evaluation import llm_call_evaluator
 # We no longer need these functions since formatting is now integrated into the main evaluator
 # from tibetan_translator.processors.evaluation import route_structured
@@ -14,9 +15,7 @@ from tibetan_translator.processors.glossary import generate_glossary
 optimizer_builder = StateGraph(State)
 
 # Add processing nodes
-optimizer_builder.add_node("commentary_translator_1", commentary_translator_1)
-optimizer_builder.add_node("commentary_translator_2", commentary_translator_2)
-optimizer_builder.add_node("commentary_translator_3", commentary_translator_3)
+optimizer_builder.add_node("commentary_translators", commentary_translators)
 optimizer_builder.add_node("aggregator", aggregator)
 optimizer_builder.add_node("translation_generator", translation_generator)
 optimizer_builder.add_node("llm_call_evaluator", llm_call_evaluator)
@@ -26,13 +25,16 @@ optimizer_builder.add_node("generate_glossary", generate_glossary)
 # optimizer_builder.add_node("formater", formater)
 
 # Define workflow edges
-optimizer_builder.add_edge(START, "commentary_translator_1")
-optimizer_builder.add_edge(START, "commentary_translator_2")
-optimizer_builder.add_edge(START, "commentary_translator_3")
-optimizer_builder.add_edge("commentary_translator_1", "aggregator")
-optimizer_builder.add_edge("commentary_translator_2", "aggregator")
-optimizer_builder.add_edge("commentary_translator_3", "aggregator")
-optimizer_builder.add_edge("aggregator", "translation_generator")
+optimizer_builder.add_edge(START, "commentary_translators")
+optimizer_builder.add_edge("commentary_translators", "aggregator")
+if SELF_REVISION_ENABLED:
+    # The first translation is drafted and revised in one call; the evaluator
+    # loop only runs translation_generator for translations it rejects
+    optimizer_builder.add_node("translate_with_self_revision", translate_with_self_revision)
+    optimizer_builder.add_edge("aggregator", "translate_with_self_revision")
+    optimizer_builder.add_edge("translate_with_self_revision", "llm_call_evaluator")
+else:
+    optimizer_builder.add_edge("aggregator", "translation_generator")
 optimizer_builder.add_edge("translation_generator", "llm_call_evaluator")
 
 optimizer_builder.add_conditional_edges(